@@ -0,0 +1,16 @@
+"""
+Chroma collection settings shared by every RAG system variant
+"""
+
+import os
+
+# Every variant opens this collection in ./vector_db. HNSW settings only take
+# effect when the collection is first created, so they are defined once here;
+# they match the committed vector_db
+COLLECTION_NAME = "insurance_policies"
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": int(os.getenv("HNSW_EF_SEARCH", "100"))
+}
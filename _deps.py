@@ -0,0 +1,13 @@
+"""
+API dependency checks shared by setup_api.py and start_server.py
+"""
+
+import importlib.util
+import sys
+
+# Modules the API server needs, in display order
+REQUIRED_MODULES = ("fastapi", "uvicorn", "httpx", "pydantic", "loguru", "dotenv")
+
+def is_present(module: str) -> bool:
+    """Whether a module is importable, without importing it"""
+    return module in sys.modules or importlib.util.find_spec(module) is not None
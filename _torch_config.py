@@ -0,0 +1,26 @@
+"""
+Torch CPU settings shared by every RAG system variant
+"""
+
+import os
+
+import torch
+
+_torch_configured = False
+
+def configure_torch() -> None:
+    """Configure torch CPU threading and fast paths once per process"""
+    global _torch_configured
+    if _torch_configured:
+        return
+    _torch_configured = True
+    
+    # One thread per physical core (assuming 2-way SMT) for intra-op work
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // 2))
+    try:
+        # Only allowed before torch has started any inter-op parallel work
+        torch.set_num_interop_threads(2)
+    except RuntimeError:
+        pass
+    torch.backends.mkldnn.enabled = True
+    torch.set_float32_matmul_precision('high')
@@ -4,29 +4,50 @@ FastAPI Backend for Insurance Policy RAG System with Groq LLM Integration
 """
 
 import os
+import sys
+import hmac
+import hashlib
 import json
+import time
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from pathlib import Path
+import numpy as np
 import httpx
-from fastapi import FastAPI, HTTPException, Depends, status
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
 from loguru import logger
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Write log records from a background thread so handlers never block on I/O
+logger.remove()
+logger.add(sys.stderr, level=os.getenv("LOG_LEVEL", "INFO"), enqueue=True)
+
 # Import our RAG system
 from insurance_rag_no_spacy import InsuranceRAGSystem
+from query_cache import LRUCache, SemanticCache
 
 # Configuration from environment variables
 API_TOKEN = os.getenv("API_TOKEN", "c94dfd1ae12b50eb392cd6d1ef5f4578c561f54bacf6cd6849236cbfc2e8b673")
+_API_TOKEN_BYTES = API_TOKEN.encode()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+GROQ_BATCH_SIZE = int(os.getenv("GROQ_BATCH_SIZE", "3"))
+# Longer chunks are truncated so a single chunk cannot bloat the prompt
+MAX_CONTEXT_CHARS_PER_CHUNK = int(os.getenv("MAX_CONTEXT_CHARS_PER_CHUNK", "2000"))
+# Each worker process holds its own RAG system, model and caches
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
 
 # Validate required environment variables
 if not GROQ_API_KEY:
@@ -36,7 +57,8 @@ if not GROQ_API_KEY:
 app = FastAPI(
     title="Insurance Policy RAG API",
     description="Retrieval-Augmented Generation API for Insurance Policy Documents",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -48,11 +70,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class NonStreamingGZipMiddleware(GZipMiddleware):
+    """GZip middleware that leaves server-sent event streams uncompressed.
+    
+    The gzip compressor buffers small writes, which would hold back SSE deltas.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress large responses such as long answer lists
+app.add_middleware(NonStreamingGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Security
 security = HTTPBearer()
 
-# Initialize RAG system
-rag_system = None
+# RAG system, published on app.state once initialized; rag_state is
+# "warming" while loading, then "ready" or "failed"
+app.state.rag = None
+app.state.rag_state = "warming"
+
+# Changes whenever the vector database does; GET /api/v1/query ETags are
+# derived from it, so a restart or re-ingest invalidates them
+app.state.corpus_version = time.time_ns()
+
+# Cache of answers keyed by question embedding, so paraphrased questions
+# skip retrieval and the Groq call
+semantic_cache = SemanticCache()
+
+# Exact-match cache for repeated identical questions, checked before embedding
+answer_cache = LRUCache(max_size=2048)
+RUN_TOP_K = 3
+
+# Whole responses keyed by a hash of the request payload, so an identical
+# submission skips the per-question work entirely
+response_cache = LRUCache(max_size=256)
+
+def answer_cache_key(question: str, top_k: int = RUN_TOP_K) -> tuple:
+    """Build the exact-match cache key for a question"""
+    return (question.strip().lower(), top_k)
+
+def payload_hash(request: "RunRequest") -> str:
+    """SHA-256 of the canonical JSON form of a run request"""
+    payload = {'documents': request.documents, 'questions': request.questions}
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def clear_answer_caches() -> None:
+    """Invalidate cached answers after the vector database changes"""
+    answer_cache.clear()
+    semantic_cache.clear()
+    response_cache.clear()
+    app.state.corpus_version = time.time_ns()
+
+def query_etag(question: str, top_k: int) -> str:
+    """Weak ETag for a direct query against the current vector database"""
+    key = f"{app.state.corpus_version}:{top_k}:{question}"
+    return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag == "*" or tag.removeprefix("W/") == opaque
+        for tag in (part.strip() for part in if_none_match.split(","))
+    )
 
 # Pydantic models
 class RunRequest(BaseModel):
@@ -70,17 +154,28 @@ class HealthResponse(BaseModel):
 
 # Authentication dependency
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    if credentials.credentials != API_TOKEN:
+    # Constant-time comparison so response timing does not leak the token
+    if not hmac.compare_digest(credentials.credentials.encode(), _API_TOKEN_BYTES):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API token"
         )
     return credentials.credentials
 
+def get_rag(request: Request) -> InsuranceRAGSystem:
+    """Return the initialized RAG system, or fail with 503 while it is unavailable"""
+    rag = request.app.state.rag
+    if rag is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="RAG system not initialized"
+        )
+    return rag
+
 # Initialize RAG system with existing vector database
 def initialize_rag_system():
     """Initialize the RAG system using existing vector database"""
-    global rag_system
+    app.state.rag_state = "warming"
     try:
         logger.info("Initializing RAG system with existing vector database...")
         
@@ -88,39 +183,94 @@ def initialize_rag_system():
         vector_db_path = Path("./vector_db")
         if not vector_db_path.exists():
             logger.error("Vector database not found at ./vector_db")
+            app.state.rag_state = "failed"
             return False
         
         # Initialize RAG system with existing data
-        rag_system = InsuranceRAGSystem("./Training_pdfs")
+        # Only publish the system once it is ready to serve queries
+        system = InsuranceRAGSystem("./Training_pdfs")
         
         # Check if vector database has data
-        if not rag_system.has_data():
+        if not system.has_data():
             logger.warning("Vector database appears to be empty or corrupted")
+            
+            # Workers would all ingest into the same SQLite store at once
+            if WEB_CONCURRENCY > 1:
+                logger.error(f"Not populating the vector database with {WEB_CONCURRENCY} workers; "
+                             "start once with WEB_CONCURRENCY=1 to ingest the PDFs")
+                app.state.rag_state = "failed"
+                return False
+            
             logger.info("Attempting to process PDFs to populate vector database...")
             
             # Try to process PDFs if vector database is empty
             pdf_files = list(Path("./Training_pdfs").glob("*.pdf"))
             if pdf_files:
                 logger.info(f"Found {len(pdf_files)} PDF files to process")
-                rag_system.process_pdfs()
+                system.process_pdfs()
+                clear_answer_caches()
                 
                 # Check again after processing
-                if not rag_system.has_data():
+                if not system.has_data():
                     logger.error("Failed to populate vector database")
+                    app.state.rag_state = "failed"
                     return False
             else:
                 logger.error("No PDF files found in Training_pdfs directory")
+                app.state.rag_state = "failed"
                 return False
         
         # Get statistics to verify the system is working
-        stats = rag_system.get_statistics()
+        stats = system.get_statistics()
         logger.info(f"RAG system ready. Total chunks: {stats['total_chunks']}")
         
+        app.state.rag = system
+        app.state.rag_state = "ready"
         return True
     except Exception as e:
         logger.error(f"Failed to initialize RAG system: {e}")
+        app.state.rag_state = "failed"
         return False
 
+def build_context(results: List[Dict[str, Any]]) -> str:
+    """Combine retrieved chunks into a prompt context"""
+    return "\n---\n".join(
+        f"Source: {result['metadata']['source_file']}\n"
+        f"Section: {result['metadata']['section_type']}\n"
+        f"Content: {result['content'][:MAX_CONTEXT_CHARS_PER_CHUNK]}"
+        for result in results
+    )
+
+# Static instructions shared by every Groq request. Keeping them in the system
+# message, ahead of the per-request context, gives all calls an identical
+# prompt prefix that the provider can cache.
+SYSTEM_PROMPT = """You are an expert insurance policy analyst. You answer questions about insurance policies using only the context from insurance policy documents supplied in the user message.
+
+Guidelines:
+- Answer accurately and concisely, quoting amounts, periods, percentages and conditions exactly as they appear in the context.
+- If the context does not contain the answer, say that the information is not available in the policy documents.
+- Do not invent policy terms, benefits, limits or exclusions that are not supported by the context.
+
+Response format:
+- If the user message contains a single question, reply with the answer only.
+- If the user message contains a numbered list of questions, reply with only a JSON array of strings containing one answer per question, in the same order as the questions."""
+
+class GroqAPIError(Exception):
+    """Raised when the Groq API returns a non-200 response"""
+    
+    def __init__(self, status_code: int, retry_after: Optional[str] = None):
+        super().__init__(f"Groq API returned status {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+    
+    @property
+    def retryable(self) -> bool:
+        """Rate limits and server errors are worth retrying"""
+        return self.status_code == 429 or self.status_code >= 500
+
+def is_retryable_groq_error(error: BaseException) -> bool:
+    return isinstance(error, GroqAPIError) and error.retryable
+
 # Groq API client
 class GroqClient:
     def __init__(self, api_key: str):
@@ -130,6 +280,70 @@ class GroqClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled HTTP client, creating it on first use"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                http2=True
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def check_connection(self) -> bool:
+        """Probe the Groq API with a lightweight model listing request"""
+        response = await self._get_client().get("/models")
+        return response.status_code == 200
+    
+    def _build_payload(self, user_content: str, max_tokens: int = 500, stream: bool = False) -> Dict[str, Any]:
+        """Build a chat completion payload behind the static system prompt"""
+        return {
+            "model": "llama3-8b-8192",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": user_content
+                }
+            ],
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+    
+    async def _chat_completion(self, user_content: str, max_tokens: int = 500) -> str:
+        """Send a chat completion behind the static system prompt and return the reply text"""
+        payload = self._build_payload(user_content, max_tokens)
+        
+        # Back off and retry on rate limits and server errors
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(3),
+            wait=wait_exponential_jitter(initial=0.2, max=2.0),
+            retry=retry_if_exception(is_retryable_groq_error),
+            reraise=True
+        ):
+            with attempt:
+                response = await self._get_client().post("/chat/completions", json=payload)
+                
+                if response.status_code != 200:
+                    logger.error(f"Groq API error: {response.status_code} - {response.text}")
+                    raise GroqAPIError(response.status_code, response.headers.get("retry-after"))
+        
+        result = response.json()
+        return result["choices"][0]["message"]["content"].strip()
     
     async def generate_answer(self, question: str, context: str) -> str:
         """Generate answer using Groq LLM"""
@@ -137,82 +351,141 @@ class GroqClient:
             return "Error: Groq API key not configured. Please set GROQ_API_KEY in .env file."
         
         try:
-            prompt = f"""You are an expert insurance policy analyst. Based on the following context from insurance policy documents, answer the question accurately and concisely.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:"""
-            
-            payload = {
-                "model": "llama3-8b-8192",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.1,
-                "max_tokens": 500
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result["choices"][0]["message"]["content"].strip()
-                else:
-                    logger.error(f"Groq API error: {response.status_code} - {response.text}")
-                    return f"Error generating answer: {response.status_code}"
-                    
+            return await self._chat_completion(f"Context:\n{context}\n\nQuestion: {question}")
+        
+        except GroqAPIError as e:
+            # Let rate limits reach the endpoint so the client can back off
+            if e.retryable:
+                raise
+            return f"Error generating answer: {e.status_code}"
         except Exception as e:
             logger.error(f"Error calling Groq API: {e}")
             return f"Error generating answer: {str(e)}"
+    
+    async def stream_answer(self, question: str, context: str) -> AsyncIterator[str]:
+        """Stream answer tokens from Groq as they are generated"""
+        payload = self._build_payload(f"Context:\n{context}\n\nQuestion: {question}", stream=True)
+        
+        async with self._get_client().stream("POST", "/chat/completions", json=payload) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"Groq API error: {response.status_code} - {body.decode(errors='replace')}")
+                raise GroqAPIError(response.status_code, response.headers.get("retry-after"))
+            
+            # Server-sent events: one "data: {...}" line per delta
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                delta = orjson.loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
+    
+    async def generate_answers_batch(self, questions: List[str], context: str) -> List[str]:
+        """Generate answers for several questions sharing one context in a single completion"""
+        numbered_questions = "\n".join(f"{n}. {question}" for n, question in enumerate(questions, 1))
+        content = await self._chat_completion(
+            f"Context:\n{context}\n\nQuestions:\n{numbered_questions}",
+            max_tokens=500 * len(questions)
+        )
+        
+        # Ignore any text the model wraps around the array
+        answers = orjson.loads(content[content.find("["):content.rfind("]") + 1])
+        if not isinstance(answers, list) or len(answers) != len(questions):
+            raise ValueError(f"Expected {len(questions)} answers, got {answers!r}")
+        
+        return [str(answer).strip() for answer in answers]
 
 # Initialize Groq client
 groq_client = GroqClient(GROQ_API_KEY)
 
+async def answer_batch(batch: List[tuple]) -> List[Any]:
+    """Answer a batch of pending questions with one Groq call.
+    
+    Falls back to one call per question if the batched reply cannot be used.
+    """
+    if len(batch) > 1:
+        questions = [question for _, question, _, _ in batch]
+        
+        # Union of the retrieved chunks, keeping the first occurrence of each
+        merged_results = {}
+        for _, _, results, _ in batch:
+            for result in results:
+                merged_results.setdefault(result['content'], result)
+        
+        try:
+            return await groq_client.generate_answers_batch(questions, build_context(list(merged_results.values())))
+        except GroqAPIError as e:
+            # Retrying per question would only add load to a rate-limited API
+            if e.retryable:
+                raise
+            logger.warning(f"Batched answer generation failed, falling back to per-question calls: {e}")
+        except Exception as e:
+            logger.warning(f"Batched answer generation failed, falling back to per-question calls: {e}")
+    
+    return await asyncio.gather(
+        *(groq_client.generate_answer(question, build_context(results)) for _, question, results, _ in batch),
+        return_exceptions=True
+    )
+
+async def warm_rag_system():
+    """Initialize the RAG system in a worker thread so the server keeps serving"""
+    rag_ready = await asyncio.to_thread(initialize_rag_system)
+    app.state.vector_db_ready = Path("./vector_db").exists()
+    if not rag_ready:
+        logger.error("Failed to initialize RAG system")
+
+async def refresh_vector_db_ready(interval: float = 30.0):
+    """Periodically re-check the vector database directory for /health"""
+    while True:
+        await asyncio.sleep(interval)
+        app.state.vector_db_ready = Path("./vector_db").exists()
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize systems on startup"""
     logger.info("Starting Insurance Policy RAG API...")
     
-    # Initialize RAG system
-    rag_ready = initialize_rag_system()
-    if not rag_ready:
-        logger.error("Failed to initialize RAG system")
+    # Check the vector database once here; /health reads the cached flag
+    app.state.vector_db_ready = Path("./vector_db").exists()
+    app.state.vector_db_refresh_task = asyncio.create_task(refresh_vector_db_ready())
+    
+    # Initialize RAG system in the background; /health reports "warming" meanwhile
+    app.state.rag_init_task = asyncio.create_task(warm_rag_system())
     
     # Test Groq connection if API key is available
     if GROQ_API_KEY:
         try:
-            test_response = await groq_client.generate_answer(
-                "Test question", 
-                "Test context"
-            )
-            logger.info("Groq API connection successful")
+            if await groq_client.check_connection():
+                logger.info("Groq API connection successful")
+            else:
+                logger.error("Groq API connection failed")
         except Exception as e:
             logger.error(f"Groq API connection failed: {e}")
     else:
         logger.warning("Groq API key not configured")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections on shutdown"""
+    app.state.vector_db_refresh_task.cancel()
+    await groq_client.aclose()
+
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(response: Response):
     """Health check endpoint"""
-    global rag_system
-    
-    rag_ready = rag_system is not None
+    rag_ready = app.state.rag is not None
     groq_ready = GROQ_API_KEY is not None
-    vector_db_ready = Path("./vector_db").exists()
+    vector_db_ready = app.state.vector_db_ready
     
-    status_value = "healthy" if rag_ready and vector_db_ready else "degraded"
+    if app.state.rag_state == "warming":
+        # Not ready to take traffic yet
+        status_value = "warming"
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    else:
+        status_value = "healthy" if rag_ready and vector_db_ready else "degraded"
     
     return HealthResponse(
         status=status_value,
@@ -221,61 +494,153 @@ async def health_check():
         vector_db_ready=vector_db_ready
     )
 
+# The answers are built here, so they are returned as an ORJSONResponse, which
+# FastAPI does not re-validate; response_model still documents the schema
 @app.post("/api/v1/hackrx/run", response_model=RunResponse)
 async def run_submission(
     request: RunRequest,
-    token: str = Depends(verify_token)
+    x_payload_hash: Optional[str] = Header(None),
+    token: str = Depends(verify_token),
+    rag_system: InsuranceRAGSystem = Depends(get_rag)
 ):
     """
     Process insurance policy questions using RAG + Groq LLM
     """
-    global rag_system
-    
-    if rag_system is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="RAG system not initialized"
-        )
-    
     if not GROQ_API_KEY:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Groq API key not configured"
         )
     
+    # The hash is always recomputed; a client-supplied one is only compared
+    request_hash = payload_hash(request)
+    if x_payload_hash is not None and x_payload_hash != request_hash:
+        logger.debug("X-Payload-Hash does not match request payload")
+    
+    cached_answers = response_cache.get(request_hash)
+    if cached_answers is not None:
+        return ORJSONResponse(
+            {"answers": list(cached_answers)},
+            headers={"X-Payload-Hash": request_hash, "X-Cache": "HIT"}
+        )
+    
     try:
-        logger.info(f"Processing {len(request.questions)} questions")
+        start_time = time.perf_counter()
+        logger.debug("Processing {} questions", len(request.questions))
+        
+        # Retrieve context for every question first, then generate the
+        # remaining answers with Groq; results are kept in question order
+        answers = [None] * len(request.questions)
+        uncached = []
+        pending = []
         
-        answers = []
+        # Repeated questions are answered once and copied to their positions
+        first_index = {}
+        duplicates = []
         
         for i, question in enumerate(request.questions):
-            logger.info(f"Processing question {i+1}: {question}")
-            
-            # Get relevant context from RAG system
-            results = rag_system.query(question, top_k=3)
+            logger.debug("Processing question {}: {}", i + 1, question)
             
-            if not results:
-                answers.append("No relevant information found in the policy documents.")
+            key = answer_cache_key(question)
+            if key in first_index:
+                duplicates.append((i, first_index[key]))
                 continue
+            first_index[key] = i
             
-            # Combine context from top results
-            context_parts = []
-            for result in results:
-                context_parts.append(f"Source: {result['metadata']['source_file']}")
-                context_parts.append(f"Section: {result['metadata']['section_type']}")
-                context_parts.append(f"Content: {result['content']}")
-                context_parts.append("---")
+            # Return a cached answer for an identical question
+            cached_answer = answer_cache.get(key)
+            if cached_answer is not None:
+                logger.debug("Answer cache hit for question {}", i + 1)
+                answers[i] = cached_answer
+                continue
             
-            context = "\n".join(context_parts)
+            uncached.append((i, question))
+        
+        if uncached:
+            # Embedding and vector search block, so run them in a worker thread
+            # and handle every question in one batch
+            query_embeddings = await asyncio.to_thread(
+                rag_system.embed_queries, [question for _, question in uncached]
+            )
             
-            # Generate answer using Groq
-            answer = await groq_client.generate_answer(question, context)
-            answers.append(answer)
+            to_retrieve = []
+            for (i, question), query_embedding in zip(uncached, query_embeddings):
+                # Return a cached answer for semantically equivalent questions
+                cached_answer = semantic_cache.lookup(query_embedding, threshold=SEMANTIC_CACHE_THRESHOLD)
+                if cached_answer is not None:
+                    logger.debug("Semantic cache hit for question {}", i + 1)
+                    answer_cache.put(answer_cache_key(question), cached_answer)
+                    answers[i] = cached_answer
+                    continue
+                
+                to_retrieve.append((i, question, query_embedding))
             
-            logger.info(f"Generated answer for question {i+1}")
+            # Get relevant context from RAG system
+            if to_retrieve:
+                batch_results = await asyncio.to_thread(
+                    rag_system.batch_query,
+                    [question for _, question, _ in to_retrieve],
+                    top_k=RUN_TOP_K,
+                    query_embeddings=np.stack([query_embedding for _, _, query_embedding in to_retrieve])
+                )
+                
+                for (i, question, query_embedding), results in zip(to_retrieve, batch_results):
+                    if not results:
+                        answers[i] = "No relevant information found in the policy documents."
+                        continue
+                    
+                    pending.append((i, question, results, query_embedding))
+        
+        # Questions are answered in small batches that share one prompt, so the
+        # context is prefilled once per batch; batches run concurrently
+        batches = [pending[n:n + GROQ_BATCH_SIZE] for n in range(0, len(pending), GROQ_BATCH_SIZE)]
+        tasks = [asyncio.create_task(answer_batch(batch)) for batch in batches]
+        try:
+            generated = await asyncio.gather(*tasks)
+        except BaseException:
+            # A rate-limited batch fails the request; stop the others from
+            # calling Groq and collect their outcomes so none go unretrieved
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        
+        for batch, batch_answers in zip(batches, generated):
+            for (i, question, _, query_embedding), answer in zip(batch, batch_answers):
+                if is_retryable_groq_error(answer):
+                    raise answer
+                elif isinstance(answer, Exception):
+                    logger.error("Error generating answer for question {}: {}", i + 1, answer)
+                    answer = f"Error generating answer: {str(answer)}"
+                elif not answer.startswith("Error"):
+                    answer_cache.put(answer_cache_key(question), answer)
+                    semantic_cache.insert(query_embedding, answer)
+                    logger.debug("Generated answer for question {}", i + 1)
+                answers[i] = answer
+        
+        for i, original in duplicates:
+            answers[i] = answers[original]
+        
+        if not any(answer.startswith("Error") for answer in answers):
+            response_cache.put(request_hash, tuple(answers))
+        
+        logger.info(
+            "Processed {} questions in {:.2f}s",
+            len(request.questions), time.perf_counter() - start_time
+        )
         
-        return RunResponse(answers=answers)
+        return ORJSONResponse(
+            {"answers": answers},
+            headers={"X-Payload-Hash": request_hash, "X-Cache": "MISS"}
+        )
         
+    except GroqAPIError as e:
+        logger.error(f"Groq API unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Groq API is rate limited or unavailable, please retry later",
+            headers={"Retry-After": e.retry_after or "2"}
+        )
     except Exception as e:
         logger.error(f"Error processing submission: {e}")
         raise HTTPException(
@@ -283,24 +648,84 @@ async def run_submission(
             detail=f"Error processing submission: {str(e)}"
         )
 
-@app.get("/api/v1/stats")
-async def get_stats(token: str = Depends(verify_token)):
-    """Get RAG system statistics"""
-    global rag_system
+def sse_event(data: Dict[str, Any]) -> bytes:
+    """Encode one server-sent event"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+@app.post("/api/v1/hackrx/run/stream")
+async def run_submission_stream(
+    request: RunRequest,
+    token: str = Depends(verify_token),
+    rag_system: InsuranceRAGSystem = Depends(get_rag)
+):
+    """
+    Stream answers to insurance policy questions as server-sent events.
     
-    if rag_system is None:
+    Each event carries the question index and either a text delta, a final
+    "done" marker, or an error; the stream ends with "data: [DONE]".
+    """
+    if not GROQ_API_KEY:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="RAG system not initialized"
+            detail="Groq API key not configured"
         )
     
+    async def event_stream():
+        for i, question in enumerate(request.questions):
+            key = answer_cache_key(question)
+            try:
+                # Cached answers are sent as a single delta
+                answer = answer_cache.get(key)
+                if answer is None:
+                    query_embedding = await asyncio.to_thread(rag_system.embed_query, question)
+                    answer = semantic_cache.lookup(query_embedding, threshold=SEMANTIC_CACHE_THRESHOLD)
+                
+                if answer is not None:
+                    yield sse_event({"index": i, "delta": answer})
+                else:
+                    results = await asyncio.to_thread(
+                        rag_system.query, question, top_k=RUN_TOP_K, query_embedding=query_embedding
+                    )
+                    if not results:
+                        yield sse_event({"index": i, "delta": "No relevant information found in the policy documents."})
+                    else:
+                        deltas = []
+                        async for delta in groq_client.stream_answer(question, build_context(results)):
+                            deltas.append(delta)
+                            yield sse_event({"index": i, "delta": delta})
+                        
+                        # An empty stream is not an answer; don't serve it again
+                        answer = "".join(deltas).strip()
+                        if answer:
+                            answer_cache.put(key, answer)
+                            semantic_cache.insert(query_embedding, answer)
+                
+                yield sse_event({"index": i, "done": True})
+            
+            except Exception as e:
+                logger.error(f"Error streaming answer for question {i+1}: {e}")
+                yield sse_event({"index": i, "error": f"Error generating answer: {str(e)}"})
+        
+        yield b"data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/api/v1/stats")
+async def get_stats(
+    token: str = Depends(verify_token),
+    rag_system: InsuranceRAGSystem = Depends(get_rag)
+):
+    """Get RAG system statistics"""
     try:
         stats = rag_system.get_statistics()
         return {
             "total_documents": stats['total_documents'],
             "total_chunks": stats['total_chunks'],
             "vector_db_size": stats['vector_db_size'],
-            "processed_files": stats['processed_files']
+            "processed_files": stats['processed_files'],
+            "answer_cache": answer_cache.get_statistics(),
+            "semantic_cache": semantic_cache.get_statistics(),
+            "response_cache": response_cache.get_statistics()
         }
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
@@ -309,23 +734,10 @@ async def get_stats(token: str = Depends(verify_token)):
             detail=f"Error getting statistics: {str(e)}"
         )
 
-@app.post("/api/v1/query")
-async def query_rag(
-    question: str,
-    top_k: int = 5,
-    token: str = Depends(verify_token)
-):
-    """Query the RAG system directly"""
-    global rag_system
-    
-    if rag_system is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="RAG system not initialized"
-        )
-    
+async def run_direct_query(rag_system: InsuranceRAGSystem, question: str, top_k: int) -> Dict[str, Any]:
+    """Retrieve chunks for a question without the LLM"""
     try:
-        results = rag_system.query(question, top_k=top_k)
+        results = await asyncio.to_thread(rag_system.query, question, top_k=top_k)
         
         formatted_results = []
         for result in results:
@@ -347,10 +759,46 @@ async def query_rag(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error querying RAG system: {str(e)}"
         )
+
+@app.post("/api/v1/query")
+async def query_rag(
+    question: str,
+    top_k: int = 5,
+    token: str = Depends(verify_token),
+    rag_system: InsuranceRAGSystem = Depends(get_rag)
+):
+    """Query the RAG system directly"""
+    return await run_direct_query(rag_system, question, top_k)
+
+@app.get("/api/v1/query")
+async def query_rag_get(
+    response: Response,
+    question: str,
+    top_k: int = 5,
+    if_none_match: Optional[str] = Header(None),
+    token: str = Depends(verify_token),
+    rag_system: InsuranceRAGSystem = Depends(get_rag)
+):
+    """Query the RAG system directly; repeat requests revalidate with If-None-Match"""
+    # The tag depends only on the request and the corpus version, so a
+    # match is answered before any embedding or search
+    etag = query_etag(question, top_k)
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return await run_direct_query(rag_system, question, top_k)
+
 if __name__ == "__main__":
+    # uvloop and httptools ship with uvicorn[standard]; each worker process
+    # loads its own RAG system, caches and Groq connection pool, so more than
+    # one worker is opt-in through WEB_CONCURRENCY
     uvicorn.run(
         "api_backend:app",
         host="0.0.0.0",
         port=int(os.environ.get("PORT", 8000)),  # read from env
-        log_level="info"
+        loop="uvloop",
+        http="httptools",
+        workers=WEB_CONCURRENCY,
+        log_level="warning"
     )
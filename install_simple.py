@@ -26,10 +26,11 @@ def install_packages_individual():
     
     packages = [
         ("pypdf2", "PDF processing"),
-        ("pdfplumber", "Advanced PDF processing"),
+        ("PyMuPDF", "Fast PDF processing"),
         ("sentence-transformers", "Text embeddings"),
         ("chromadb", "Vector database"),
         ("numpy", "Numerical computing"),
+        ("pyahocorasick", "Fast term matching"),
         ("pandas", "Data manipulation"),
         ("nltk", "Natural language processing"),
         ("spacy", "Advanced NLP")
@@ -81,10 +82,11 @@ def test_imports():
     
     essential_imports = [
         ("pypdf2", "PyPDF2"),
-        ("pdfplumber", "PDFPlumber"),
+        ("fitz", "PyMuPDF"),
         ("sentence_transformers", "Sentence Transformers"),
         ("chromadb", "ChromaDB"),
         ("numpy", "NumPy"),
+        ("ahocorasick", "pyahocorasick"),
         ("pandas", "Pandas"),
         ("nltk", "NLTK")
     ]
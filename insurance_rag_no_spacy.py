@@ -14,12 +14,15 @@ import pdfplumber
 
 # NLP and ML
 import nltk
+import torch
 from sentence_transformers import SentenceTransformer
 
 # Vector Database
 import chromadb
 from chromadb.config import Settings
 
+from _collection import COLLECTION_NAME, COLLECTION_METADATA
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -321,7 +324,8 @@ class InsuranceRAGSystem:
     Complete RAG system for insurance policy documents
     """
     
-    def __init__(self, pdf_directory: str, vector_db_path: str = "./vector_db"):
+    def __init__(self, pdf_directory: str, vector_db_path: str = "./vector_db",
+                 chroma_client: Optional["chromadb.ClientAPI"] = None):
         self.pdf_directory = Path(pdf_directory)
         self.vector_db_path = Path(vector_db_path)
         self.vector_db_path.mkdir(exist_ok=True)
@@ -330,11 +334,12 @@ class InsuranceRAGSystem:
         self.chunker = InsurancePolicyChunker()
         self.embedder = InsuranceEmbedder()
         
-        # Initialize vector database
-        self.client = chromadb.PersistentClient(path=str(self.vector_db_path))
+        # Initialize vector database, reusing a caller's client for the same path
+        self.client = chroma_client or chromadb.PersistentClient(path=str(self.vector_db_path))
+        # HNSW settings are shared by every variant; see _collection.py
         self.collection = self.client.get_or_create_collection(
-            name="insurance_policies",
-            metadata={"hnsw:space": "cosine"}
+            name=COLLECTION_NAME,
+            metadata=COLLECTION_METADATA
         )
         
         # Cache for processed documents
@@ -421,11 +426,44 @@ class InsuranceRAGSystem:
                 ids=[f"{source_file}_{i}"]
             )
     
-    def query(self, question: str, top_k: int = 5, filter_metadata: Optional[Dict] = None) -> List[Dict[str, Any]]:
-        """Query the RAG system"""
+    def embed_query(self, question: str) -> np.ndarray:
+        """Create a normalized embedding for a query"""
+        return self.embedder.model.encode(question, convert_to_numpy=True, normalize_embeddings=True)
+    
+    def embed_queries(self, questions: List[str]) -> np.ndarray:
+        """Create normalized embeddings for a batch of queries in one forward pass"""
+        with torch.inference_mode():
+            return self.embedder.model.encode(
+                questions,
+                batch_size=max(len(questions), 1),
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+    
+    def query(self, question: str, top_k: int = 5, filter_metadata: Optional[Dict] = None,
+              query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Query the RAG system, optionally with a precomputed query embedding"""
         # Create query embedding
-        query_embedding = self.embedder.model.encode(question, convert_to_tensor=True)
+        if query_embedding is None:
+            query_embedding = self.embed_query(question)
         
+        return self._search(np.asarray([query_embedding]), top_k, filter_metadata)[0]
+    
+    def batch_query(self, questions: List[str], top_k: int = 5, filter_metadata: Optional[Dict] = None,
+                    query_embeddings: Optional[np.ndarray] = None) -> List[List[Dict[str, Any]]]:
+        """Query the RAG system for several questions with a single vector search"""
+        if not questions:
+            return []
+        
+        # Create query embeddings
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(questions)
+        
+        return self._search(np.ascontiguousarray(query_embeddings, dtype=np.float32), top_k, filter_metadata)
+    
+    def _search(self, query_embeddings: np.ndarray, top_k: int,
+                filter_metadata: Optional[Dict] = None) -> List[List[Dict[str, Any]]]:
+        """Search the vector database and format results per query"""
         # Prepare where clause for filtering
         where_clause = None
         if filter_metadata:
@@ -433,23 +471,26 @@ class InsuranceRAGSystem:
         
         # Search in vector database
         results = self.collection.query(
-            query_embeddings=[query_embedding.cpu().numpy().tolist()],
+            query_embeddings=query_embeddings.tolist(),
             n_results=top_k,
             where=where_clause,
             include=['documents', 'metadatas', 'distances']
         )
         
         # Format results
-        formatted_results = []
-        for i in range(len(results['documents'][0])):
-            formatted_results.append({
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'similarity_score': 1 - results['distances'][0][i],  # Convert distance to similarity
-                'rank': i + 1
-            })
-        
-        return formatted_results
+        all_results = []
+        for documents, metadatas, distances in zip(results['documents'], results['metadatas'], results['distances']):
+            formatted_results = []
+            for i in range(len(documents)):
+                formatted_results.append({
+                    'content': documents[i],
+                    'metadata': metadatas[i],
+                    'similarity_score': 1 - distances[i],  # Convert distance to similarity
+                    'rank': i + 1
+                })
+            all_results.append(formatted_results)
+        
+        return all_results
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get system statistics"""
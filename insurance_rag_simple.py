@@ -2,18 +2,24 @@ import os
 import re
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import importlib.util
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
+
 import numpy as np
 import pandas as pd
 from datetime import datetime
 
 # PDF Processing
 import pypdf2
-import pdfplumber
+import fitz  # PyMuPDF
+import ahocorasick
 
 # NLP and ML
 import nltk
+import torch
 from sentence_transformers import SentenceTransformer
 import spacy
 
@@ -21,10 +27,24 @@ import spacy
 import chromadb
 from chromadb.config import Settings
 
+from _collection import COLLECTION_NAME, COLLECTION_METADATA
+from _torch_config import configure_torch
+from query_cache import LRUCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns used per line/chunk, compiled once
+_HEADER_RE = re.compile(r'^\d+\.?\d*\s+[A-Z]')
+_AMOUNT_RE = re.compile(r'\$[\d,]+(?:\.\d{2})?')
+_PCT_RE = re.compile(r'\d+(?:\.\d+)?%')
+_DATE_RE = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')
+_DIGIT_RE = re.compile(r'\d+')
+
+# Rows per collection.add() call; stays under Chroma's max batch size
+CHROMA_ADD_BATCH_SIZE = 5000
+
 # Download required NLTK data
 try:
     nltk.data.find('tokenizers/punkt')
@@ -36,13 +56,10 @@ try:
 except LookupError:
     nltk.download('stopwords')
 
-# Download spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy model...")
-    os.system("python -m spacy download en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+# Only sentence boundaries are needed, so skip the tagger/parser/NER
+# pipeline and use the rule-based sentencizer
+nlp = spacy.blank("en")
+nlp.add_pipe("sentencizer")
 
 class SimpleInsuranceChunker:
     """
@@ -62,55 +79,70 @@ class SimpleInsuranceChunker:
         ]
     
     def extract_text_from_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """Extract text from PDF with basic structure"""
-        text_content = []
-        tables = []
+        """
+        Extract text from PDF with basic structure.
         
+        'text_content' is a generator that yields line dicts page by page, so
+        create_chunks can consume lines as they are extracted. 'tables' is
+        filled in as those pages are read.
+        """
+        tables = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    # Extract text
-                    text = page.extract_text()
-                    if text:
-                        # Split into lines and process
-                        lines = text.split('\n')
-                        for line_num, line in enumerate(lines):
-                            line = line.strip()
-                            if line:
-                                # Detect section headers
-                                is_header = self._is_section_header(line)
-                                text_content.append({
-                                    'page': page_num + 1,
-                                    'line': line_num + 1,
-                                    'text': line,
-                                    'is_header': is_header,
-                                    'section_type': self._classify_section(line)
-                                })
-                    
-                    # Extract tables (simplified)
-                    page_tables = page.extract_tables()
-                    for table_num, table in enumerate(page_tables):
-                        if table and len(table) > 1:
-                            table_text = '\n'.join(['\t'.join(row) for row in table if any(cell for cell in row)])
-                            tables.append({
-                                'page': page_num + 1,
-                                'table_index': table_num,
-                                'text': table_text
-                            })
-                            
+            doc = fitz.open(pdf_path)
         except Exception as e:
             logger.error(f"Error extracting text from {pdf_path}: {e}")
+            return {'text_content': iter(()), 'tables': tables, 'total_pages': 0}
         
         return {
-            'text_content': text_content,
+            'text_content': self._iter_pdf_lines(doc, tables, pdf_path),
             'tables': tables,
-            'total_pages': len(pdf.pages) if 'pdf' in locals() else 0
+            'total_pages': doc.page_count
         }
     
+    def _iter_pdf_lines(self, doc, tables: List[Dict[str, Any]], pdf_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield the text lines of an open PDF, collecting its tables"""
+        try:
+            for page_num, page in enumerate(doc):
+                # Extract text blocks in reading order
+                line_num = 0
+                for block in page.get_text("blocks", sort=True):
+                    # Skip image blocks
+                    if block[6] != 0:
+                        continue
+                    for line in block[4].split('\n'):
+                        line_num += 1
+                        line = line.strip()
+                        if line:
+                            # Detect section headers
+                            is_header = self._is_section_header(line)
+                            yield {
+                                'page': page_num + 1,
+                                'line': line_num,
+                                'text': line,
+                                'is_header': is_header,
+                                'section_type': self._classify_section(line)
+                            }
+                
+                # Extract tables (simplified)
+                for table_num, table in enumerate(page.find_tables().tables):
+                    rows = table.extract()
+                    if rows and len(rows) > 1:
+                        table_text = '\n'.join(['\t'.join(cell or '' for cell in row) for row in rows if any(cell for cell in row)])
+                        tables.append({
+                            'page': page_num + 1,
+                            'table_index': table_num,
+                            'text': table_text
+                        })
+                        
+        except Exception as e:
+            logger.error(f"Error extracting text from {pdf_path}: {e}")
+        finally:
+            doc.close()
+    
     def _is_section_header(self, text: str) -> bool:
         """Detect if text is a section header"""
         # Check for numbered sections
-        if re.match(r'^\d+\.?\d*\s+[A-Z]', text):
+        if _HEADER_RE.match(text):
             return True
         
         # Check for all caps headers
@@ -146,43 +178,54 @@ class SimpleInsuranceChunker:
         """Create chunks from extracted data"""
         chunks = []
         
-        # Process text content
-        text_content = extracted_data['text_content']
+        # One timestamp for every chunk of this document
+        timestamp = datetime.now().isoformat()
+        
+        # Process text content line by line as it is extracted
         current_chunk = []
+        current_words = 0
         current_section = 'general'
         
-        for item in text_content:
+        for item in extracted_data['text_content']:
             text = item['text']
+            text_words = len(text.split())
             
             # Start new chunk if section changes
             if item['is_header'] and item['section_type'] != current_section:
                 if current_chunk:
-                    chunks.append(self._create_chunk_metadata(current_chunk, current_section))
+                    chunks.append(self._create_chunk_metadata(current_chunk, current_section, timestamp))
                 current_chunk = [text]
+                current_words = text_words
                 current_section = item['section_type']
             else:
                 current_chunk.append(text)
+                current_words += text_words
             
             # Check if chunk size limit reached
-            chunk_text = ' '.join(current_chunk)
-            if len(chunk_text.split()) > self.chunk_size:
-                # Split at sentence boundaries
-                sentences = self._split_into_sentences(chunk_text)
+            if current_words > self.chunk_size:
+                # Split at sentence boundaries. This stays inline rather than
+                # batched through nlp.pipe: the leftover sentences seed the
+                # next chunk, so each split depends on the previous one
+                sentences = self._split_into_sentences(' '.join(current_chunk))
                 temp_chunk = []
+                temp_words = 0
                 
                 for sentence in sentences:
+                    sentence_words = len(sentence.split())
                     temp_chunk.append(sentence)
-                    temp_text = ' '.join(temp_chunk)
-                    if len(temp_text.split()) > self.chunk_size:
+                    temp_words += sentence_words
+                    if temp_words > self.chunk_size:
                         if temp_chunk:
-                            chunks.append(self._create_chunk_metadata(temp_chunk[:-1], current_section))
+                            chunks.append(self._create_chunk_metadata(temp_chunk[:-1], current_section, timestamp))
                         temp_chunk = [sentence]
+                        temp_words = sentence_words
                 
                 current_chunk = temp_chunk
+                current_words = temp_words
         
         # Add remaining chunk
         if current_chunk:
-            chunks.append(self._create_chunk_metadata(current_chunk, current_section))
+            chunks.append(self._create_chunk_metadata(current_chunk, current_section, timestamp))
         
         # Process tables as separate chunks
         for table in extracted_data['tables']:
@@ -198,7 +241,7 @@ class SimpleInsuranceChunker:
         
         return chunks
     
-    def _create_chunk_metadata(self, text_list: List[str], section_type: str) -> Dict[str, Any]:
+    def _create_chunk_metadata(self, text_list: List[str], section_type: str, timestamp: str) -> Dict[str, Any]:
         """Create chunk with metadata"""
         content = ' '.join(text_list)
         return {
@@ -208,12 +251,12 @@ class SimpleInsuranceChunker:
                 'section_type': section_type,
                 'word_count': len(content.split()),
                 'char_count': len(content),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': timestamp
             }
         }
     
     def _split_into_sentences(self, text: str) -> List[str]:
-        """Split text into sentences using spaCy"""
+        """Split text into sentences using the spaCy sentencizer"""
         doc = nlp(text)
         return [sent.text.strip() for sent in doc.sents]
 
@@ -222,9 +265,34 @@ class SimpleInsuranceEmbedder:
     Simplified embedding system for insurance policy documents
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: Optional[str] = None):
+        configure_torch()
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        
+        # ONNX Runtime is much faster than PyTorch for CPU inference; use it
+        # when optimum[onnxruntime] is installed
+        if backend is None:
+            onnx_available = (importlib.util.find_spec("onnxruntime") is not None
+                              and importlib.util.find_spec("optimum") is not None)
+            backend = 'onnx' if self.device == 'cpu' and onnx_available else 'torch'
+        self.backend = backend
+        
+        if backend == 'onnx':
+            # Set ONNX_MODEL_FILE to e.g. onnx/model_qint8_avx512_vnni.onnx
+            # for the int8-quantized export on AVX-512 VNNI hosts
+            self.model = SentenceTransformer(
+                model_name,
+                device=self.device,
+                backend='onnx',
+                model_kwargs={"file_name": os.getenv("ONNX_MODEL_FILE", "onnx/model.onnx")}
+            )
+        else:
+            self.model = SentenceTransformer(model_name, device=self.device)
+            if self.device == 'cuda':
+                # Half precision halves memory traffic on GPU
+                self.model.half()
+        logger.info(f"Loaded {model_name} with {backend} backend on {self.device}")
         
         # Insurance-specific vocabulary
         self.insurance_terms = [
@@ -232,50 +300,74 @@ class SimpleInsuranceEmbedder:
             'policyholder', 'beneficiary', 'endorsement', 'rider',
             'underwriting', 'actuary', 'indemnity', 'subrogation'
         ]
-    
-    def create_embeddings(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Create embeddings for chunks"""
-        enhanced_chunks = []
+        self.legal_terms = ['shall', 'must', 'required', 'obligation', 'liability']
         
-        for chunk in chunks:
-            content = chunk['content']
-            
-            # Extract basic features
-            features = self._extract_features(content)
-            
-            # Create embedding
-            embedding = self.model.encode(content, convert_to_tensor=True)
-            
-            # Enhance chunk with features
-            enhanced_chunk = {
-                **chunk,
-                'embedding': embedding.cpu().numpy(),
-                'features': features,
-                'semantic_score': self._calculate_semantic_score(content)
-            }
-            
-            enhanced_chunks.append(enhanced_chunk)
+        # One automaton finds every term in a single pass over the text
+        self.term_automaton = ahocorasick.Automaton()
+        for term in self.insurance_terms + self.legal_terms:
+            self.term_automaton.add_word(term, term)
+        self.term_automaton.make_automaton()
+    
+    def create_embeddings(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Create embeddings and features for chunks.
+        
+        Returns columnar data: an (N, dim) float32 'embeddings' array and a
+        'features' DataFrame with one row per chunk.
+        """
+        contents = [chunk['content'] for chunk in chunks]
+        if not contents:
+            return {'embeddings': np.empty((0, 0), dtype=np.float32), 'features': pd.DataFrame()}
+        
+        # Encode all chunks in one batched call
+        embeddings = self.model.encode(
+            contents,
+            batch_size=64,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+        
+        computed = [self._compute_all_features(content) for content in contents]
+        features = pd.DataFrame([chunk_features for chunk_features, _ in computed])
+        features['semantic_score'] = self._calculate_semantic_scores(
+            np.array([score_inputs for _, score_inputs in computed], dtype=np.float32)
+        )
         
-        return enhanced_chunks
+        return {'embeddings': embeddings, 'features': features}
+    
+    def _count_terms(self, text_lower: str) -> Dict[str, int]:
+        """Count insurance and legal term occurrences in one scan"""
+        counts = dict.fromkeys(self.insurance_terms + self.legal_terms, 0)
+        for _, term in self.term_automaton.iter(text_lower):
+            counts[term] += 1
+        return counts
     
-    def _extract_features(self, text: str) -> Dict[str, Any]:
-        """Extract basic features from text"""
+    def _compute_all_features(self, text: str) -> Tuple[Dict[str, Any], Tuple[int, int, int]]:
+        """
+        Extract basic features from text in a single pass.
+        
+        Also returns the (terms present, numbers, words) counts the semantic
+        score is computed from, so the text is lowered and split only once.
+        """
         text_lower = text.lower()
+        counts = self._count_terms(text_lower)
         
         # Count insurance terms
-        term_counts = {term: text_lower.count(term) for term in self.insurance_terms}
+        term_counts = {f'{term}_count': counts[term] for term in self.insurance_terms}
         
         # Extract numerical values
-        amounts = re.findall(r'\$[\d,]+(?:\.\d{2})?', text)
-        percentages = re.findall(r'\d+(?:\.\d+)?%', text)
-        dates = re.findall(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', text)
+        amounts = _AMOUNT_RE.findall(text)
+        percentages = _PCT_RE.findall(text)
+        dates = _DATE_RE.findall(text)
+        number_count = len(_DIGIT_RE.findall(text))
         
         # Calculate text statistics
         words = text.split()
         sentences = text.split('.')
         
-        return {
-            'insurance_terms': term_counts,
+        features = {
+            **term_counts,
             'amounts': amounts,
             'percentages': percentages,
             'dates': dates,
@@ -283,26 +375,30 @@ class SimpleInsuranceEmbedder:
             'sentence_count': len(sentences),
             'avg_sentence_length': len(words) / len(sentences) if sentences else 0,
             'has_table_data': any(char.isdigit() for char in text),
-            'has_legal_terms': any(term in text_lower for term in ['shall', 'must', 'required', 'obligation'])
+            'has_legal_terms': any(counts[term] for term in ['shall', 'must', 'required', 'obligation'])
         }
-    
-    def _calculate_semantic_score(self, text: str) -> float:
-        """Calculate semantic relevance score"""
-        text_lower = text.lower()
-        
-        # Base score from insurance terms
-        term_score = sum(1 for term in self.insurance_terms if term in text_lower)
-        
-        # Boost for legal/contractual language
-        legal_boost = sum(1 for word in ['shall', 'must', 'required', 'obligation', 'liability'] if word in text_lower)
+        terms_present = sum(1 for count in counts.values() if count)
         
-        # Boost for numerical data
-        numerical_boost = len(re.findall(r'\d+', text)) * 0.1
+        return features, (terms_present, number_count, len(words))
+    
+    def _calculate_semantic_scores(self, score_inputs: np.ndarray) -> np.ndarray:
+        """Calculate semantic relevance scores for all chunks at once"""
+        terms_present, number_counts, word_counts = score_inputs.T
         
-        # Normalize score
-        total_score = (term_score + legal_boost + numerical_boost) / max(len(text.split()), 1)
+        # Insurance terms and legal/contractual language score by presence,
+        # numerical data boosts by 0.1 per number
+        scores = (terms_present + 0.1 * number_counts) / np.maximum(word_counts, 1)
         
-        return min(total_score, 1.0)
+        return np.minimum(scores, 1.0)
+
+def _extract_and_chunk(pdf_path: str, chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+    """Extract and chunk one PDF; runs in a worker process"""
+    chunker = SimpleInsuranceChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    extracted_data = chunker.extract_text_from_pdf(pdf_path)
+    return {
+        'total_pages': extracted_data['total_pages'],
+        'chunks': chunker.create_chunks(extracted_data)
+    }
 
 class SimpleInsuranceRAGSystem:
     """
@@ -318,76 +414,228 @@ class SimpleInsuranceRAGSystem:
         self.chunker = SimpleInsuranceChunker()
         self.embedder = SimpleInsuranceEmbedder()
         
+        # Query encoder bound once to the embedder's device/backend
+        self._encode = partial(
+            self.embedder.model.encode,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            batch_size=1,
+            show_progress_bar=False
+        )
+        
         # Initialize vector database
         self.client = chromadb.PersistentClient(path=str(self.vector_db_path))
+        # HNSW settings are shared by every variant; see _collection.py
         self.collection = self.client.get_or_create_collection(
-            name="insurance_policies",
-            metadata={"hnsw:space": "cosine"}
+            name=COLLECTION_NAME,
+            metadata=COLLECTION_METADATA
         )
         
         # Cache for processed documents
         self.processed_docs = {}
+        
+        # Per-chunk columns behind get_statistics, one row per stored chunk;
+        # contents and embeddings themselves live only in Chroma
+        self.chunk_sources: List[str] = []
+        self.section_types: List[str] = []
+        self.word_counts: List[int] = []
+        
+        # Caches for repeated questions
+        self.embedding_cache = LRUCache(max_size=4096)
+        self.result_cache = LRUCache(max_size=1024)
+        
+        # Reload the chunk store saved by a previous run
+        self.chunk_store_path = self.vector_db_path / "chunk_store.json"
+        self._load_columns()
     
     def process_pdfs(self) -> None:
-        """Process all PDFs in the directory"""
-        pdf_files = list(self.pdf_directory.glob("*.pdf"))
-        
-        for pdf_file in pdf_files:
-            logger.info(f"Processing {pdf_file.name}")
+        """Process new and changed PDFs in the directory"""
+        # Files stored by an earlier run are skipped while their size and
+        # mtime are unchanged; largest first so a late big PDF doesn't leave
+        # one worker busy
+        file_stats = {pdf_file: pdf_file.stat() for pdf_file in self.pdf_directory.glob("*.pdf")}
+        pdf_files = sorted(
+            (pdf_file for pdf_file, stat in file_stats.items() if not self._is_stored(pdf_file.name, stat)),
+            key=lambda p: file_stats[p].st_size, reverse=True
+        )
+        if not pdf_files:
+            logger.info("All PDFs already stored")
+            return
+        
+        # Cached results may be stale once new chunks are stored
+        self.result_cache.clear()
+        
+        # Extract and chunk every PDF in parallel; this phase is CPU-bound
+        extracted = {}
+        max_workers = min(os.cpu_count() or 1, len(pdf_files))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                pdf_file: executor.submit(
+                    _extract_and_chunk,
+                    str(pdf_file),
+                    self.chunker.chunk_size,
+                    self.chunker.chunk_overlap
+                )
+                for pdf_file in pdf_files
+            }
+            for pdf_file, future in futures.items():
+                logger.info(f"Processing {pdf_file.name}")
+                try:
+                    extracted[pdf_file] = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {pdf_file.name}: {e}")
+        
+        # Embed the chunks of all documents in one batched call
+        all_chunks = [chunk for data in extracted.values() for chunk in data['chunks']]
+        if not all_chunks:
+            return
+        batch = self.embedder.create_embeddings(all_chunks)
+        
+        stored = []
+        start = 0
+        for pdf_file, data in extracted.items():
+            chunks = data['chunks']
+            end = start + len(chunks)
             
             try:
-                # Extract and chunk
-                extracted_data = self.chunker.extract_text_from_pdf(str(pdf_file))
-                chunks = self.chunker.create_chunks(extracted_data)
-                
-                # Create embeddings
-                enhanced_chunks = self.embedder.create_embeddings(chunks)
+                # Replace any chunks stored for an earlier version of the file
+                self._remove_file(pdf_file.name)
                 
                 # Store in vector database
-                self._store_chunks(enhanced_chunks, pdf_file.name)
+                self._store_chunks(chunks, batch['embeddings'][start:end],
+                                   batch['features'].iloc[start:end], pdf_file.name)
+                stored.append((start, end, pdf_file.name))
                 
                 # Cache processed data
                 self.processed_docs[pdf_file.name] = {
-                    'chunks': enhanced_chunks,
                     'metadata': {
                         'file_path': str(pdf_file),
-                        'file_size': pdf_file.stat().st_size,
-                        'total_pages': extracted_data['total_pages'],
-                        'total_chunks': len(enhanced_chunks),
+                        'file_size': file_stats[pdf_file].st_size,
+                        'file_mtime': file_stats[pdf_file].st_mtime_ns,
+                        'total_pages': data['total_pages'],
+                        'total_chunks': len(chunks),
                         'processed_at': datetime.now().isoformat()
                     }
                 }
                 
-                logger.info(f"Successfully processed {pdf_file.name} - {len(enhanced_chunks)} chunks")
+                logger.info(f"Successfully processed {pdf_file.name} - {len(chunks)} chunks")
                 
             except Exception as e:
                 logger.error(f"Error processing {pdf_file.name}: {e}")
+            start = end
+        
+        self._append_columns(all_chunks, stored)
+        self._save_columns()
     
-    def _store_chunks(self, chunks: List[Dict[str, Any]], source_file: str) -> None:
+    def _is_stored(self, source_file: str, stat: os.stat_result) -> bool:
+        """Whether a file was stored by an earlier run and has not changed since"""
+        metadata = self.processed_docs.get(source_file, {}).get('metadata')
+        return (metadata is not None
+                and metadata['file_size'] == stat.st_size
+                and metadata.get('file_mtime') == stat.st_mtime_ns)
+    
+    def _remove_file(self, source_file: str) -> None:
+        """Drop a file's chunks from Chroma and the column store"""
+        self.collection.delete(where={'source_file': source_file})
+        keep = [i for i, source in enumerate(self.chunk_sources) if source != source_file]
+        if len(keep) != len(self.chunk_sources):
+            self.chunk_sources = [self.chunk_sources[i] for i in keep]
+            self.section_types = [self.section_types[i] for i in keep]
+            self.word_counts = [self.word_counts[i] for i in keep]
+        self.processed_docs.pop(source_file, None)
+    
+    def _append_columns(self, chunks: List[Dict[str, Any]], stored: List[tuple]) -> None:
+        """Append the successfully stored rows of a batch to the column store"""
+        for start, end, source_file in stored:
+            self.chunk_sources.extend([source_file] * (end - start))
+            for chunk in chunks[start:end]:
+                self.section_types.append(chunk['metadata'].get('section_type', 'general'))
+                self.word_counts.append(chunk['metadata'].get('word_count', 0))
+    
+    def _save_columns(self) -> None:
+        """Write the chunk store next to the vector database"""
+        store = {
+            'chunk_sources': self.chunk_sources,
+            'section_types': self.section_types,
+            'word_counts': self.word_counts,
+            'processed_docs': self.processed_docs
+        }
+        
+        # Write to a temporary file and rename, so a crash never leaves a
+        # half-written store behind
+        store_tmp = self.chunk_store_path.with_suffix('.json.tmp')
+        with open(store_tmp, 'w') as f:
+            json.dump(store, f)
+        os.replace(store_tmp, self.chunk_store_path)
+    
+    def _load_columns(self) -> None:
+        """Load a saved chunk store"""
+        if not self.chunk_store_path.exists():
+            return
+        
+        try:
+            with open(self.chunk_store_path) as f:
+                store = json.load(f)
+            
+            self.chunk_sources = store['chunk_sources']
+            self.section_types = store['section_types']
+            self.word_counts = store['word_counts']
+            self.processed_docs = store['processed_docs']
+            logger.info(f"Loaded {len(self.word_counts)} chunks from {self.chunk_store_path}")
+        except Exception as e:
+            logger.error(f"Error loading chunk store: {e}")
+    
+    def _store_chunks(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray,
+                      features: pd.DataFrame, source_file: str) -> None:
         """Store chunks in vector database"""
-        for i, chunk in enumerate(chunks):
-            # Prepare metadata
-            metadata = {
+        if not chunks:
+            return
+        
+        documents = [chunk['content'] for chunk in chunks]
+        ids = [f"{source_file}_{i}" for i in range(len(chunks))]
+        
+        # Chroma metadata values must be scalars; tolist() yields Python types
+        scalar_features = features.select_dtypes(include=['number', 'bool'])
+        feature_columns = {column: scalar_features[column].tolist() for column in scalar_features.columns}
+        metadatas = [
+            {
                 'source_file': source_file,
                 'chunk_index': i,
                 'chunk_type': chunk['type'],
                 'section_type': chunk['metadata'].get('section_type', 'general'),
                 'word_count': chunk['metadata'].get('word_count', 0),
-                **chunk.get('features', {})
+                **{column: values[i] for column, values in feature_columns.items()}
             }
-            
-            # Add to collection
+            for i, chunk in enumerate(chunks)
+        ]
+        
+        # Add to collection in as few calls as Chroma's batch limit allows
+        for start in range(0, len(chunks), CHROMA_ADD_BATCH_SIZE):
+            end = start + CHROMA_ADD_BATCH_SIZE
             self.collection.add(
-                embeddings=[chunk['embedding'].tolist()],
-                documents=[chunk['content']],
-                metadatas=[metadata],
-                ids=[f"{source_file}_{i}"]
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
             )
     
+    def _embed_query(self, question: str) -> np.ndarray:
+        """Encode a question, reusing the embedding for repeated questions"""
+        embedding = self.embedding_cache.get(question)
+        if embedding is None:
+            embedding = self._encode(question)
+            self.embedding_cache.put(question, embedding)
+        return embedding
+    
     def query(self, question: str, top_k: int = 5, filter_metadata: Optional[Dict] = None) -> List[Dict[str, Any]]:
         """Query the RAG system"""
+        cache_key = (question, top_k, json.dumps(filter_metadata, sort_keys=True) if filter_metadata else None)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return [dict(result) for result in cached]
+        
         # Create query embedding
-        query_embedding = self.embedder.model.encode(question, convert_to_tensor=True)
+        query_embedding = self._embed_query(question)
         
         # Prepare where clause for filtering
         where_clause = None
@@ -396,7 +644,7 @@ class SimpleInsuranceRAGSystem:
         
         # Search in vector database
         results = self.collection.query(
-            query_embeddings=[query_embedding.cpu().numpy().tolist()],
+            query_embeddings=query_embedding.reshape(1, -1),
             n_results=top_k,
             where=where_clause,
             include=['documents', 'metadatas', 'distances']
@@ -412,22 +660,31 @@ class SimpleInsuranceRAGSystem:
                 'rank': i + 1
             })
         
-        return formatted_results
+        self.result_cache.put(cache_key, formatted_results)
+        return [dict(result) for result in formatted_results]
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get system statistics"""
+        # Chunk counts are reductions over the per-chunk columns
+        word_counts = np.asarray(self.word_counts, dtype=np.int32)
+        sources, source_chunks = np.unique(self.chunk_sources, return_counts=True)
+        chunks_per_file = dict(zip(sources.tolist(), source_chunks.tolist()))
+        section_types, section_chunks = np.unique(self.section_types, return_counts=True)
+        
         stats = {
             'total_documents': len(self.processed_docs),
-            'total_chunks': sum(len(doc['chunks']) for doc in self.processed_docs.values()),
+            'total_chunks': len(word_counts),
             'processed_files': list(self.processed_docs.keys()),
-            'vector_db_size': len(self.collection.get()['ids']) if self.collection.count() > 0 else 0
+            'vector_db_size': self.collection.count(),
+            'section_types': dict(zip(section_types.tolist(), section_chunks.tolist())),
+            'avg_words_per_chunk': float(word_counts.mean()) if len(word_counts) else 0.0
         }
         
         # Add per-file statistics
         file_stats = {}
         for filename, data in self.processed_docs.items():
             file_stats[filename] = {
-                'chunks': len(data['chunks']),
+                'chunks': chunks_per_file.get(filename, 0),
                 'pages': data['metadata']['total_pages'],
                 'file_size_mb': data['metadata']['file_size'] / (1024 * 1024)
             }
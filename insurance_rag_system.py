@@ -1,8 +1,14 @@
 import os
 import re
 import json
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import importlib.util
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+import multiprocessing
+from typing import Iterable, List, Dict, Any, Optional, Set, Tuple
 from pathlib import Path
 import numpy as np
 import pandas as pd
@@ -13,13 +19,13 @@ import pypdf2
 import pdfplumber
 import tabula
 import camelot
+import ahocorasick
 
 # NLP and ML
 import nltk
 import spacy
+import torch
 from sentence_transformers import SentenceTransformer, util
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 # Vector Database
 import chromadb
@@ -32,6 +38,10 @@ from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.schema import Document
 
+from _collection import COLLECTION_NAME, COLLECTION_METADATA
+from _torch_config import configure_torch
+from query_cache import LRUCache
+
 # Download required NLTK data
 try:
     nltk.data.find('tokenizers/punkt')
@@ -43,18 +53,57 @@ try:
 except LookupError:
     nltk.download('stopwords')
 
-# Download spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy model...")
-    os.system("python -m spacy download en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+# Only sentence boundaries are needed, so skip the tagger/parser/NER
+# pipeline and use the rule-based sentencizer
+nlp = spacy.blank("en")
+nlp.add_pipe("sentencizer")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns used per line/chunk, compiled once
+_HEADER_RE = re.compile(r'^\d+\.?\d*\s+[A-Z]')
+_AMOUNT_RE = re.compile(r'\$[\d,]+(?:\.\d{2})?')
+_PCT_RE = re.compile(r'\d+(?:\.\d+)?%')
+_DATE_RE = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')
+_POLICY_RE = re.compile(r'[A-Z]{2,}\d{6,}')
+_DIGIT_RE = re.compile(r'\d')
+_NUMBER_RE = re.compile(r'\d+')
+
+# Section types, interned as int8 codes in extracted text_content
+SECTION_TYPES = ('general', 'coverage', 'exclusion', 'definition',
+                 'condition', 'premium', 'claim', 'schedule')
+_SECTION_CODES = {name: code for code, name in enumerate(SECTION_TYPES)}
+
+# Bit i of a chunk's insurance_terms_mask is set when INSURANCE_TERMS[i] occurs
+INSURANCE_TERMS = ('premium', 'deductible', 'coverage', 'exclusion', 'claim',
+                   'policyholder', 'beneficiary', 'endorsement', 'rider',
+                   'underwriting', 'actuary', 'indemnity', 'subrogation',
+                   'grace period', 'contestability', 'incontestability')
+
+# Rows per collection.add() call; stays under Chroma's max batch size
+CHROMA_ADD_BATCH_SIZE = 5000
+
+# Set in pool workers so only one of them runs tabula's JVM at a time
+_tabula_lock = None
+
+def _init_pdf_worker(tabula_lock) -> None:
+    """Initializer for PDF processing worker processes"""
+    global _tabula_lock
+    _tabula_lock = tabula_lock
+
+def _read_page(page) -> Tuple[List[str], List[List[List[str]]], bool]:
+    """Extract text lines, tables and whether ruling lines exist from one pdfplumber page"""
+    text = page.extract_text()
+    lines = text.split('\n') if text else []
+    return lines, page.extract_tables(), bool(page.lines or page.rects)
+
+def _extract_page(pdf_path: str, page_index: int) -> Tuple[List[str], List[List[List[str]]], bool]:
+    """Read one PDF page; runs in a worker process"""
+    with pdfplumber.open(pdf_path) as pdf:
+        return _read_page(pdf.pages[page_index])
+
 class InsurancePolicyChunker:
     """
     Advanced chunking strategy specifically designed for insurance policy documents
@@ -64,6 +113,9 @@ class InsurancePolicyChunker:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         
+        # All chunks from one chunker share a processing timestamp
+        self._run_ts = datetime.now().isoformat()
+        
         # Insurance-specific keywords for semantic chunking
         self.section_keywords = [
             'policy', 'coverage', 'exclusions', 'terms', 'conditions',
@@ -72,6 +124,30 @@ class InsurancePolicyChunker:
             'schedule', 'endorsement', 'rider', 'clause', 'provision'
         ]
         
+        # Words that classify a line, in priority order
+        self.section_words = {
+            'coverage': ['coverage', 'cover', 'insured'],
+            'exclusion': ['exclusion', 'excluded', 'not covered'],
+            'definition': ['definition', 'defined', 'means'],
+            'condition': ['condition', 'term', 'provision'],
+            'premium': ['premium', 'payment', 'cost'],
+            'claim': ['claim', 'claimant', 'notification'],
+            'schedule': ['schedule', 'table', 'summary']
+        }
+        
+        # One automaton over header keywords and section words, so each line
+        # is scanned once; payload is (section code or None, is header keyword)
+        entries = {}
+        for section, words in self.section_words.items():
+            for word in words:
+                entries.setdefault(word, [None, False])[0] = _SECTION_CODES[section]
+        for keyword in self.section_keywords:
+            entries.setdefault(keyword, [None, False])[1] = True
+        self._line_automaton = ahocorasick.Automaton()
+        for word, (code, is_keyword) in entries.items():
+            self._line_automaton.add_word(word, (code, is_keyword))
+        self._line_automaton.make_automaton()
+        
         # Initialize text splitters
         self.recursive_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
@@ -84,126 +160,173 @@ class InsurancePolicyChunker:
             chunk_overlap=chunk_overlap
         )
     
-    def extract_tables_from_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
-        """Extract tables from PDF using multiple methods for better accuracy"""
+    def extract_tables_from_pdf(self, pdf_path: str, methods: Tuple[str, ...] = ('pdfplumber',)) -> List[Dict[str, Any]]:
+        """Extract tables from PDF; see _open_and_extract_all"""
+        return self._open_and_extract_all(pdf_path, methods=methods)['tables']
+    
+    def _open_and_extract_all(self, pdf_path: str, workers: int = 1,
+                              methods: Tuple[str, ...] = ('pdfplumber',)) -> Dict[str, Any]:
+        """
+        Read text lines and tables from every page in one pdfplumber pass.
+        
+        With workers > 1, pages are read in a process pool. tabula and camelot
+        each re-parse the whole document (tabula starts a JVM), so they run
+        only when listed in methods, or camelot runs as a fallback on pages
+        where pdfplumber found no table but the page has ruling lines.
+        """
+        page_lines = []
         tables = []
+        ruled_pages = []
+        total_pages = 0
         
         try:
-            # Method 1: Using tabula-py
-            tabula_tables = tabula.read_pdf(pdf_path, pages='all', multiple_tables=True)
-            for i, table in enumerate(tabula_tables):
-                if not table.empty:
-                    tables.append({
-                        'method': 'tabula',
-                        'table_index': i,
-                        'data': table.to_dict('records'),
-                        'text': table.to_string()
-                    })
-        except Exception as e:
-            logger.warning(f"Tabula extraction failed: {e}")
-        
-        try:
-            # Method 2: Using camelot-py
-            camelot_tables = camelot.read_pdf(pdf_path, pages='all')
-            for i, table in enumerate(camelot_tables):
-                if table.df.shape[0] > 0:
-                    tables.append({
-                        'method': 'camelot',
-                        'table_index': i,
-                        'data': table.df.to_dict('records'),
-                        'text': table.df.to_string(),
-                        'accuracy': table.accuracy
-                    })
-        except Exception as e:
-            logger.warning(f"Camelot extraction failed: {e}")
-        
-        try:
-            # Method 3: Using pdfplumber
             with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_tables = page.extract_tables()
-                    for table_num, table in enumerate(page_tables):
-                        if table and len(table) > 1:  # At least header and one row
-                            tables.append({
-                                'method': 'pdfplumber',
-                                'page': page_num + 1,
-                                'table_index': table_num,
-                                'data': table,
-                                'text': '\n'.join(['\t'.join(row) for row in table if any(cell for cell in row)])
-                            })
+                pages = pdf.pages
+                total_pages = len(pages)
+                if workers > 1 and total_pages > 1:
+                    with ProcessPoolExecutor(max_workers=min(workers, total_pages)) as executor:
+                        page_results = list(executor.map(_extract_page,
+                                                         [pdf_path] * total_pages,
+                                                         range(total_pages)))
+                else:
+                    page_results = [_read_page(page) for page in pages]
+            
+            for page_num, (lines, page_tables, has_rulings) in enumerate(page_results):
+                page_lines.append(lines)
+                if 'pdfplumber' not in methods:
+                    continue
+                
+                found = False
+                for table_num, table in enumerate(page_tables):
+                    if table and len(table) > 1:  # At least header and one row
+                        found = True
+                        tables.append({
+                            'method': 'pdfplumber',
+                            'page': page_num + 1,
+                            'table_index': table_num,
+                            'data': table,
+                            'text': '\n'.join(['\t'.join(cell or '' for cell in row) for row in table if any(cell for cell in row)])
+                        })
+                if not found and has_rulings:
+                    ruled_pages.append(page_num + 1)
         except Exception as e:
-            logger.warning(f"PDFPlumber extraction failed: {e}")
+            logger.error(f"Error extracting text from {pdf_path}: {e}")
         
-        return tables
-    
-    def extract_text_with_structure(self, pdf_path: str) -> Dict[str, Any]:
-        """Extract text with preserved structure and metadata"""
-        text_content = []
-        tables = self.extract_tables_from_pdf(pdf_path)
+        if 'tabula' in methods:
+            try:
+                with _tabula_lock or nullcontext():
+                    tabula_tables = tabula.read_pdf(pdf_path, pages='all', multiple_tables=True)
+                for i, table in enumerate(tabula_tables):
+                    if not table.empty:
+                        tables.append({
+                            'method': 'tabula',
+                            'table_index': i,
+                            'data': table.to_dict('records'),
+                            'text': table.to_string()
+                        })
+            except Exception as e:
+                logger.warning(f"Tabula extraction failed: {e}")
         
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    # Extract text with positioning
-                    text = page.extract_text()
-                    if text:
-                        # Identify sections and subsections
-                        lines = text.split('\n')
-                        for line_num, line in enumerate(lines):
-                            line = line.strip()
-                            if line:
-                                # Detect section headers
-                                is_header = self._is_section_header(line)
-                                text_content.append({
-                                    'page': page_num + 1,
-                                    'line': line_num + 1,
-                                    'text': line,
-                                    'is_header': is_header,
-                                    'section_type': self._classify_section(line)
-                                })
-        except Exception as e:
-            logger.error(f"Error extracting text from {pdf_path}: {e}")
+        if 'camelot' in methods:
+            camelot_pages = 'all'
+        elif ruled_pages:
+            camelot_pages = ','.join(str(page) for page in ruled_pages)
+        else:
+            camelot_pages = None
+        
+        if camelot_pages:
+            try:
+                camelot_tables = camelot.read_pdf(pdf_path, pages=camelot_pages)
+                for i, table in enumerate(camelot_tables):
+                    if table.df.shape[0] > 0:
+                        tables.append({
+                            'method': 'camelot',
+                            'page': int(table.page),
+                            'table_index': i,
+                            'data': table.df.to_dict('records'),
+                            'text': table.df.to_string(),
+                            'accuracy': table.accuracy
+                        })
+            except Exception as e:
+                logger.warning(f"Camelot extraction failed: {e}")
         
         return {
-            'text_content': text_content,
+            'page_lines': page_lines,
             'tables': tables,
-            'total_pages': len(pdf.pages) if 'pdf' in locals() else 0
+            'total_pages': total_pages
         }
     
-    def _is_section_header(self, text: str) -> bool:
-        """Detect if text is a section header"""
+    def extract_text_with_structure(self, pdf_path: str, workers: int = 1) -> Dict[str, Any]:
+        """
+        Extract text with preserved structure and metadata.
+        
+        'text_content' holds one entry per line as parallel columns: a list of
+        'texts' plus 'pages', 'lines', 'is_header' and 'section_type' arrays,
+        the latter as int8 codes into SECTION_TYPES.
+        
+        The PDF is opened once for text and tables; with workers > 1 pages are
+        read in a process pool and lines are classified here in page order.
+        """
+        texts, pages, line_numbers, headers, sections = [], [], [], [], []
+        extracted = self._open_and_extract_all(pdf_path, workers=workers)
+        
+        for page_num, lines in enumerate(extracted['page_lines']):
+            # Identify sections and subsections
+            for line_num, line in enumerate(lines):
+                line = line.strip()
+                if line:
+                    # Detect section headers
+                    texts.append(line)
+                    pages.append(page_num + 1)
+                    line_numbers.append(line_num + 1)
+                    is_header, section = self._analyze_line(line)
+                    headers.append(is_header)
+                    sections.append(section)
+        
+        return {
+            'text_content': {
+                'texts': texts,
+                'pages': np.asarray(pages, dtype=np.int32),
+                'lines': np.asarray(line_numbers, dtype=np.int32),
+                'is_header': np.asarray(headers, dtype=np.bool_),
+                'section_type': np.asarray(sections, dtype=np.int8)
+            },
+            'tables': extracted['tables'],
+            'total_pages': extracted['total_pages']
+        }
+    
+    def _scan_line(self, text_lower: str) -> Tuple[bool, int]:
+        """Return whether a header keyword occurs and the line's section code"""
+        has_keyword = False
+        best = None
+        for _, (code, is_keyword) in self._line_automaton.iter(text_lower):
+            has_keyword = has_keyword or is_keyword
+            if code is not None and (best is None or code < best):
+                best = code
+        return has_keyword, best or _SECTION_CODES['general']
+    
+    def _analyze_line(self, text: str) -> Tuple[bool, int]:
+        """Detect a section header and classify the line in one scan"""
+        has_keyword, section = self._scan_line(text.lower())
+        return self._is_header_shape(text) or has_keyword, section
+    
+    @staticmethod
+    def _is_header_shape(text: str) -> bool:
+        """Check numbering and capitalization that mark a header"""
         # Check for numbered sections (e.g., "1. Coverage", "2.1 Definitions")
-        if re.match(r'^\d+\.?\d*\s+[A-Z]', text):
+        if _HEADER_RE.match(text):
             return True
         
         # Check for all caps headers
-        if text.isupper() and len(text) > 3 and len(text) < 100:
-            return True
-        
-        # Check for insurance-specific keywords
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in self.section_keywords)
+        return text.isupper() and len(text) > 3 and len(text) < 100
+    
+    def _is_section_header(self, text: str) -> bool:
+        """Detect if text is a section header"""
+        return self._analyze_line(text)[0]
     
     def _classify_section(self, text: str) -> str:
         """Classify the type of section"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['coverage', 'cover', 'insured']):
-            return 'coverage'
-        elif any(word in text_lower for word in ['exclusion', 'excluded', 'not covered']):
-            return 'exclusion'
-        elif any(word in text_lower for word in ['definition', 'defined', 'means']):
-            return 'definition'
-        elif any(word in text_lower for word in ['condition', 'term', 'provision']):
-            return 'condition'
-        elif any(word in text_lower for word in ['premium', 'payment', 'cost']):
-            return 'premium'
-        elif any(word in text_lower for word in ['claim', 'claimant', 'notification']):
-            return 'claim'
-        elif any(word in text_lower for word in ['schedule', 'table', 'summary']):
-            return 'schedule'
-        else:
-            return 'general'
+        return SECTION_TYPES[self._scan_line(text.lower())[1]]
     
     def create_semantic_chunks(self, extracted_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Create semantic chunks with context preservation"""
@@ -212,40 +335,48 @@ class InsurancePolicyChunker:
         # Process text content
         text_content = extracted_data['text_content']
         current_chunk = []
-        current_section = 'general'
+        current_words = 0
+        current_section = _SECTION_CODES['general']
         
-        for item in text_content:
-            text = item['text']
+        for text, is_header, section in zip(text_content['texts'],
+                                            text_content['is_header'].tolist(),
+                                            text_content['section_type'].tolist()):
+            text_words = len(text.split())
             
             # Start new chunk if section changes
-            if item['is_header'] and item['section_type'] != current_section:
+            if is_header and section != current_section:
                 if current_chunk:
-                    chunks.append(self._create_chunk_metadata(current_chunk, current_section))
+                    chunks.append(self._create_chunk_metadata(current_chunk, SECTION_TYPES[current_section]))
                 current_chunk = [text]
-                current_section = item['section_type']
+                current_words = text_words
+                current_section = section
             else:
                 current_chunk.append(text)
+                current_words += text_words
             
             # Check if chunk size limit reached
-            chunk_text = ' '.join(current_chunk)
-            if len(chunk_text.split()) > self.chunk_size:
+            if current_words > self.chunk_size:
                 # Split at sentence boundaries
-                sentences = self._split_into_sentences(chunk_text)
+                sentences = self._split_into_sentences(' '.join(current_chunk))
                 temp_chunk = []
+                temp_words = 0
                 
                 for sentence in sentences:
+                    sentence_words = len(sentence.split())
                     temp_chunk.append(sentence)
-                    temp_text = ' '.join(temp_chunk)
-                    if len(temp_text.split()) > self.chunk_size:
+                    temp_words += sentence_words
+                    if temp_words > self.chunk_size:
                         if temp_chunk:
-                            chunks.append(self._create_chunk_metadata(temp_chunk[:-1], current_section))
+                            chunks.append(self._create_chunk_metadata(temp_chunk[:-1], SECTION_TYPES[current_section]))
                         temp_chunk = [sentence]
+                        temp_words = sentence_words
                 
                 current_chunk = temp_chunk
+                current_words = temp_words
         
         # Add remaining chunk
         if current_chunk:
-            chunks.append(self._create_chunk_metadata(current_chunk, current_section))
+            chunks.append(self._create_chunk_metadata(current_chunk, SECTION_TYPES[current_section]))
         
         # Process tables as separate chunks
         for table in extracted_data['tables']:
@@ -273,12 +404,12 @@ class InsurancePolicyChunker:
                 'section_type': section_type,
                 'word_count': len(content.split()),
                 'char_count': len(content),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': self._run_ts
             }
         }
     
     def _split_into_sentences(self, text: str) -> List[str]:
-        """Split text into sentences using spaCy"""
+        """Split text into sentences using the spaCy sentencizer"""
         doc = nlp(text)
         return [sent.text.strip() for sent in doc.sents]
 
@@ -287,43 +418,131 @@ class InsuranceEmbedder:
     Advanced embedding system optimized for insurance policy documents
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: Optional[str] = None,
+                 backend: Optional[str] = None):
+        configure_torch()
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        
+        if backend is None:
+            onnx_available = (importlib.util.find_spec("onnxruntime") is not None
+                              and importlib.util.find_spec("optimum") is not None)
+            backend = 'onnx' if self.device == 'cpu' and onnx_available else 'torch'
+        self.backend = backend
+        
+        self.onnx_file = os.getenv("ONNX_MODEL_FILE", "onnx/model.onnx") if backend == 'onnx' else None
+        if backend == 'onnx':
+            # Set ONNX_MODEL_FILE to e.g. onnx/model_O3.onnx for the
+            # graph-optimized export, or a qint8 file for int8 inference
+            self.model = SentenceTransformer(
+                model_name,
+                device=self.device,
+                backend='onnx',
+                model_kwargs={"file_name": self.onnx_file}
+            )
+        else:
+            self.model = SentenceTransformer(model_name, device=self.device)
+            if self.device == 'cuda':
+                # Half precision halves memory traffic on GPU
+                self.model.half()
+        logger.info(f"Loaded {model_name} with {backend} backend on {self.device}")
+        
+        # Everything that changes the vectors; cached embeddings are only
+        # reused under the same namespace
+        self.cache_namespace = f"{model_name}:{backend}:{self.onnx_file}:{self.device}"
         
         # Insurance-specific vocabulary enhancement
-        self.insurance_terms = [
-            'premium', 'deductible', 'coverage', 'exclusion', 'claim',
-            'policyholder', 'beneficiary', 'endorsement', 'rider',
-            'underwriting', 'actuary', 'indemnity', 'subrogation',
-            'grace period', 'contestability', 'incontestability'
-        ]
+        self.insurance_terms = list(INSURANCE_TERMS)
+        
+        self.legal_terms = ['shall', 'must', 'required', 'obligation', 'liability']
         
-        # Initialize TF-IDF for keyword extraction
-        self.tfidf = TfidfVectorizer(
-            max_features=1000,
-            stop_words='english',
-            ngram_range=(1, 2)
+        # One automaton finds every scoring term in a single pass
+        self.term_automaton = ahocorasick.Automaton()
+        for term in self.insurance_terms + self.legal_terms:
+            self.term_automaton.add_word(term, term)
+        self.term_automaton.make_automaton()
+        
+        # All insurance terms in one alternation, longest first so
+        # 'incontestability' is not matched as 'contestability'
+        self._terms_re = re.compile(
+            r'\b(' + '|'.join(map(re.escape, sorted(self.insurance_terms, key=len, reverse=True))) + r')\b',
+            re.IGNORECASE
         )
+        
+        # Embeddings keyed by SHA-256 of the chunk text; dirty once it
+        # differs from the saved file
+        self.embedding_cache: Dict[str, np.ndarray] = {}
+        self._embedding_cache_dirty = False
+    
+    def load_embedding_cache(self, path: Path) -> None:
+        """Load chunk embeddings saved by save_embedding_cache"""
+        if not path.exists():
+            return
+        try:
+            with np.load(path) as data:
+                self.embedding_cache.update(zip(data['hashes'].tolist(), data['embeddings'].astype(np.float16)))
+        except Exception as e:
+            logger.warning(f"Could not load embedding cache {path}: {e}")
+    
+    def save_embedding_cache(self, path: Path, keep: Optional[Set[str]] = None) -> None:
+        """Persist the chunk embedding cache, limited to the hashes in keep if given"""
+        if keep is not None and not keep.issuperset(self.embedding_cache):
+            self.embedding_cache = {
+                content_hash: embedding for content_hash, embedding in self.embedding_cache.items()
+                if content_hash in keep
+            }
+            self._embedding_cache_dirty = True
+        if not self._embedding_cache_dirty:
+            return
+        
+        if self.embedding_cache:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(
+                path,
+                hashes=np.array(list(self.embedding_cache.keys())),
+                embeddings=np.stack(list(self.embedding_cache.values()))
+            )
+        else:
+            path.unlink(missing_ok=True)
+        self._embedding_cache_dirty = False
     
     def create_enhanced_embeddings(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Create enhanced embeddings with insurance-specific features"""
-        enhanced_chunks = []
+        if not chunks:
+            return []
+        
+        # Only encode chunk texts not seen before
+        hashes = [_content_sha256(chunk['content']) for chunk in chunks]
+        missing = {}
+        for content_hash, chunk in zip(hashes, chunks):
+            if content_hash not in self.embedding_cache:
+                missing.setdefault(content_hash, chunk['content'])
+        
+        if missing:
+            # Encode in one batched call; encode() sorts the texts by length
+            # internally so each mini-batch pads to a similar size
+            new_embeddings = self.model.encode(
+                list(missing.values()),
+                batch_size=64,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+                normalize_embeddings=True
+            )
+            # Keep embeddings in float16; Chroma gets float32 only at insert
+            self.embedding_cache.update(zip(missing.keys(), new_embeddings.astype(np.float16)))
+            self._embedding_cache_dirty = True
         
-        for chunk in chunks:
+        embeddings = [self.embedding_cache[content_hash] for content_hash in hashes]
+        
+        enhanced_chunks = []
+        for chunk, embedding in zip(chunks, embeddings):
             content = chunk['content']
             
-            # Extract key features
-            features = self._extract_features(content)
-            
-            # Create embedding
-            embedding = self.model.encode(content, convert_to_tensor=True)
-            
             # Enhance chunk with features
             enhanced_chunk = {
                 **chunk,
-                'embedding': embedding.cpu().numpy(),
-                'features': features,
+                'embedding': embedding,
+                'features': self._extract_features(content),
                 'semantic_score': self._calculate_semantic_score(content)
             }
             
@@ -335,52 +554,64 @@ class InsuranceEmbedder:
         """Extract insurance-specific features from text"""
         text_lower = text.lower()
         
-        # Count insurance terms
-        term_counts = {term: text_lower.count(term) for term in self.insurance_terms}
+        # Count insurance terms in a single scan
+        found = Counter(match.group(1).lower() for match in self._terms_re.finditer(text))
+        term_counts = {term: found[term] for term in self.insurance_terms}
+        terms_mask = sum(1 << i for i, term in enumerate(INSURANCE_TERMS) if found[term])
         
         # Extract numerical values (amounts, percentages, etc.)
-        amounts = re.findall(r'\$[\d,]+(?:\.\d{2})?', text)
-        percentages = re.findall(r'\d+(?:\.\d+)?%', text)
-        dates = re.findall(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', text)
+        amounts = _AMOUNT_RE.findall(text)
+        percentages = _PCT_RE.findall(text)
+        dates = _DATE_RE.findall(text)
         
         # Extract policy numbers and references
-        policy_refs = re.findall(r'[A-Z]{2,}\d{6,}', text)
+        policy_refs = _POLICY_RE.findall(text)
         
         # Calculate text statistics
-        words = text.split()
-        sentences = text.split('.')
+        word_count = len(text.split())
+        sentence_count = text.count('.') + 1
         
         return {
             'insurance_terms': term_counts,
+            'insurance_terms_mask': terms_mask,
             'amounts': amounts,
             'percentages': percentages,
             'dates': dates,
             'policy_references': policy_refs,
-            'word_count': len(words),
-            'sentence_count': len(sentences),
-            'avg_sentence_length': len(words) / len(sentences) if sentences else 0,
-            'has_table_data': any(char.isdigit() for char in text),
+            'word_count': word_count,
+            'sentence_count': sentence_count,
+            'avg_sentence_length': word_count / sentence_count,
+            'has_table_data': bool(_DIGIT_RE.search(text)),
             'has_legal_terms': any(term in text_lower for term in ['shall', 'must', 'required', 'obligation'])
         }
     
     def _calculate_semantic_score(self, text: str) -> float:
         """Calculate semantic relevance score for insurance content"""
-        text_lower = text.lower()
-        
-        # Base score from insurance terms
-        term_score = sum(1 for term in self.insurance_terms if term in text_lower)
-        
-        # Boost for legal/contractual language
-        legal_boost = sum(1 for word in ['shall', 'must', 'required', 'obligation', 'liability'] if word in text_lower)
+        # Distinct insurance and legal/contractual terms present; the two
+        # lists don't overlap, so this is term_score + legal_boost
+        present = {term for _, term in self.term_automaton.iter(text.lower())}
         
         # Boost for numerical data
-        numerical_boost = len(re.findall(r'\d+', text)) * 0.1
+        numerical_boost = len(_NUMBER_RE.findall(text)) * 0.1
         
         # Normalize score
-        total_score = (term_score + legal_boost + numerical_boost) / max(len(text.split()), 1)
+        total_score = (len(present) + numerical_boost) / max(len(text.split()), 1)
         
         return min(total_score, 1.0)
 
+def _content_sha256(text: str) -> str:
+    """Key of a chunk's text in the embedding cache"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _extract_and_chunk(pdf_path: str, chunk_size: int, chunk_overlap: int, page_workers: int) -> Dict[str, Any]:
+    """Extract and chunk one PDF; runs in a worker process"""
+    chunker = InsurancePolicyChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    extracted_data = chunker.extract_text_with_structure(pdf_path, workers=page_workers)
+    return {
+        'total_pages': extracted_data['total_pages'],
+        'chunks': chunker.create_semantic_chunks(extracted_data)
+    }
+
 class InsuranceRAGSystem:
     """
     Complete RAG system for insurance policy documents
@@ -396,76 +627,285 @@ class InsuranceRAGSystem:
         self.embedder = InsuranceEmbedder()
         
         # Initialize vector database
-        self.client = chromadb.PersistentClient(path=str(self.vector_db_path))
+        # Set CHROMA_HOST to use a `chroma run` server instead of the
+        # embedded database, so writes happen outside this process
+        chroma_host = os.getenv("CHROMA_HOST")
+        if chroma_host:
+            self.client = chromadb.HttpClient(host=chroma_host, port=int(os.getenv("CHROMA_PORT", "8000")))
+        else:
+            self.client = chromadb.PersistentClient(path=str(self.vector_db_path))
+        # HNSW settings are shared by every variant; see _collection.py
         self.collection = self.client.get_or_create_collection(
-            name="insurance_policies",
-            metadata={"hnsw:space": "cosine"}
+            name=COLLECTION_NAME,
+            metadata=COLLECTION_METADATA
         )
         
         # Cache for processed documents
         self.processed_docs = {}
+        
+        # On-disk caches keyed by content hash, reused across runs. Chunks and
+        # embeddings depend on the model, backend and chunking settings, so
+        # each combination gets its own directory
+        namespace = (f"{self.embedder.cache_namespace}:"
+                     f"{self.chunker.chunk_size}:{self.chunker.chunk_overlap}")
+        self.cache_dir = self.vector_db_path / "cache" / hashlib.sha256(namespace.encode()).hexdigest()[:16]
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.embedding_cache_path = self.cache_dir / "chunk_embeddings.npz"
+        self.embedder.load_embedding_cache(self.embedding_cache_path)
+        
+        # Embeddings of recently asked questions
+        self.query_embedding_cache = LRUCache(max_size=4096)
+        
+        # Recover per-file statistics for documents already in the collection
+        self._load_processed_docs()
+    
+    def _load_processed_docs(self) -> None:
+        """Rebuild processed_docs from the source_file metadata stored in Chroma"""
+        total = self.collection.count()
+        for offset in range(0, total, CHROMA_ADD_BATCH_SIZE):
+            page = self.collection.get(include=['metadatas'], limit=CHROMA_ADD_BATCH_SIZE, offset=offset)
+            for chunk_id, metadata in zip(page['ids'], page['metadatas']):
+                source_file = metadata.get('source_file')
+                if not source_file:
+                    continue
+                doc = self.processed_docs.get(source_file)
+                if doc is None:
+                    pdf_file = self.pdf_directory / source_file
+                    doc = self.processed_docs[source_file] = {
+                        'chunk_ids': [],
+                        'metadata': {
+                            'file_path': str(pdf_file),
+                            'file_size': pdf_file.stat().st_size if pdf_file.exists() else 0,
+                            'total_pages': metadata.get('total_pages', 0),
+                            'total_chunks': 0,
+                            'processed_at': None
+                        }
+                    }
+                doc['chunk_ids'].append(chunk_id)
+                doc['metadata']['total_chunks'] += 1
+    
+    @staticmethod
+    def _file_sha256(path: Path) -> str:
+        """Hash a file without reading it into memory at once"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_cached_document(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Load the chunks and embeddings of a previously processed PDF"""
+        path = self.cache_dir / f"{file_hash}.npz"
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                chunks = json.loads(str(data['chunks']))
+                for chunk, embedding in zip(chunks, data['embeddings'].astype(np.float16)):
+                    chunk['embedding'] = embedding
+                return {'chunks': chunks, 'total_pages': int(data['total_pages'])}
+        except Exception as e:
+            logger.warning(f"Could not load cached document {path}: {e}")
+            return None
+    
+    def _save_cached_document(self, file_hash: str, enhanced_chunks: List[Dict[str, Any]], total_pages: int) -> None:
+        """Save a processed PDF's chunks and embeddings under its content hash"""
+        if not enhanced_chunks:
+            return
+        chunks = [{key: value for key, value in chunk.items() if key != 'embedding'} for chunk in enhanced_chunks]
+        np.savez_compressed(
+            self.cache_dir / f"{file_hash}.npz",
+            embeddings=np.stack([chunk['embedding'] for chunk in enhanced_chunks]),
+            chunks=np.array(json.dumps(chunks)),
+            total_pages=np.array(total_pages)
+        )
+    
+    def _record_document(self, pdf_file: Path, enhanced_chunks: List[Dict[str, Any]], total_pages: int) -> None:
+        """Record a processed document's metadata; its chunks live in Chroma"""
+        self.processed_docs[pdf_file.name] = {
+            'chunk_ids': [f"{pdf_file.name}_{i}" for i in range(len(enhanced_chunks))],
+            'metadata': {
+                'file_path': str(pdf_file),
+                'file_size': pdf_file.stat().st_size,
+                'total_pages': total_pages,
+                'total_chunks': len(enhanced_chunks),
+                'processed_at': datetime.now().isoformat()
+            }
+        }
     
     def process_pdfs(self) -> None:
         """Process all PDFs in the directory"""
-        pdf_files = list(self.pdf_directory.glob("*.pdf"))
-        
-        for pdf_file in pdf_files:
-            logger.info(f"Processing {pdf_file.name}")
+        pdf_files = []
+        file_hashes = {}
+        # Chunk texts of the current corpus; only their embeddings are kept
+        corpus_hashes = set()
+        for pdf_file in self.pdf_directory.glob("*.pdf"):
+            file_hash = self._file_sha256(pdf_file)
+            file_hashes[pdf_file] = file_hash
+            cached = self._load_cached_document(file_hash)
+            if cached is None:
+                pdf_files.append(pdf_file)
+                continue
             
-            try:
-                # Extract and chunk
-                extracted_data = self.chunker.extract_text_with_structure(str(pdf_file))
-                chunks = self.chunker.create_semantic_chunks(extracted_data)
-                
-                # Create embeddings
-                enhanced_chunks = self.embedder.create_enhanced_embeddings(chunks)
-                
-                # Store in vector database
-                self._store_chunks(enhanced_chunks, pdf_file.name)
-                
-                # Cache processed data
-                self.processed_docs[pdf_file.name] = {
-                    'chunks': enhanced_chunks,
-                    'metadata': {
-                        'file_path': str(pdf_file),
-                        'file_size': pdf_file.stat().st_size,
-                        'total_pages': extracted_data['total_pages'],
-                        'total_chunks': len(enhanced_chunks),
-                        'processed_at': datetime.now().isoformat()
-                    }
-                }
-                
-                logger.info(f"Successfully processed {pdf_file.name} - {len(enhanced_chunks)} chunks")
+            # Unchanged PDF: reuse its chunks and embeddings
+            logger.info(f"Loaded {pdf_file.name} from cache - {len(cached['chunks'])} chunks")
+            corpus_hashes.update(_content_sha256(chunk['content']) for chunk in cached['chunks'])
+            if not self.collection.get(ids=[f"{pdf_file.name}_0"])['ids']:
+                self._store_chunks(cached['chunks'], pdf_file.name, cached['total_pages'])
+            self._record_document(pdf_file, cached['chunks'], cached['total_pages'])
+        
+        if not pdf_files:
+            self._prune_cache(file_hashes.values(), corpus_hashes)
+            return
+        
+        # One task per file; cores left over go to page-level extraction
+        cpu_count = os.cpu_count() or 1
+        file_workers = min(cpu_count, len(pdf_files))
+        page_workers = max(1, cpu_count // len(pdf_files))
+        
+        # A single writer thread stores each document while the next one is
+        # being embedded
+        with ProcessPoolExecutor(max_workers=file_workers,
+                                 initializer=_init_pdf_worker,
+                                 initargs=(multiprocessing.Lock(),)) as executor, \
+                ThreadPoolExecutor(max_workers=1) as writer:
+            futures = {
+                pdf_file: executor.submit(
+                    _extract_and_chunk,
+                    str(pdf_file),
+                    self.chunker.chunk_size,
+                    self.chunker.chunk_overlap,
+                    page_workers
+                )
+                for pdf_file in pdf_files
+            }
+            
+            for pdf_file, future in futures.items():
+                logger.info(f"Processing {pdf_file.name}")
                 
-            except Exception as e:
-                logger.error(f"Error processing {pdf_file.name}: {e}")
+                try:
+                    # Extract and chunk
+                    extracted_data = future.result()
+                    chunks = extracted_data['chunks']
+                    
+                    # Create embeddings
+                    enhanced_chunks = self.embedder.create_enhanced_embeddings(chunks)
+                    corpus_hashes.update(_content_sha256(chunk['content']) for chunk in chunks)
+                    
+                    writer.submit(self._finish_document, pdf_file, file_hashes[pdf_file],
+                                  enhanced_chunks, extracted_data['total_pages'])
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {pdf_file.name}: {e}")
+        
+        self._prune_cache(file_hashes.values(), corpus_hashes)
     
-    def _store_chunks(self, chunks: List[Dict[str, Any]], source_file: str) -> None:
+    def _prune_cache(self, file_hashes: Iterable[str], corpus_hashes: Set[str]) -> None:
+        """Save the embedding cache for the current corpus and drop cached documents no longer in it"""
+        self.embedder.save_embedding_cache(self.embedding_cache_path, keep=corpus_hashes)
+        current = set(file_hashes)
+        for path in self.cache_dir.glob("*.npz"):
+            if path != self.embedding_cache_path and path.stem not in current:
+                path.unlink(missing_ok=True)
+    
+    def _finish_document(self, pdf_file: Path, file_hash: str, enhanced_chunks: List[Dict[str, Any]],
+                         total_pages: int) -> None:
+        """Store an embedded document and cache it; runs on the writer thread"""
+        try:
+            # Drop rows from an earlier version of the file first: add() keeps
+            # existing ids, and a shorter version leaves trailing chunks behind
+            self.collection.delete(where={'source_file': pdf_file.name})
+            self._store_chunks(enhanced_chunks, pdf_file.name, total_pages)
+            
+            # Cache processed data
+            self._record_document(pdf_file, enhanced_chunks, total_pages)
+            self._save_cached_document(file_hash, enhanced_chunks, total_pages)
+            
+            logger.info(f"Successfully processed {pdf_file.name} - {len(enhanced_chunks)} chunks")
+            
+        except Exception as e:
+            logger.error(f"Error processing {pdf_file.name}: {e}")
+    
+    def _store_chunks(self, chunks: List[Dict[str, Any]], source_file: str, total_pages: int = 0) -> None:
         """Store chunks in vector database"""
-        for i, chunk in enumerate(chunks):
-            # Prepare metadata
-            metadata = {
+        if not chunks:
+            return
+        
+        embeddings = np.stack([chunk['embedding'] for chunk in chunks]).astype(np.float32).tolist()
+        documents = [chunk['content'] for chunk in chunks]
+        ids = [f"{source_file}_{i}" for i in range(len(chunks))]
+        metadatas = [
+            {
                 'source_file': source_file,
                 'chunk_index': i,
                 'chunk_type': chunk['type'],
                 'section_type': chunk['metadata'].get('section_type', 'general'),
                 'word_count': chunk['metadata'].get('word_count', 0),
-                **chunk.get('features', {})
+                'total_pages': total_pages,
+                # Chroma metadata values must be scalars
+                **{key: value for key, value in chunk.get('features', {}).items()
+                   if isinstance(value, (str, int, float, bool))}
             }
-            
-            # Add to collection
+            for i, chunk in enumerate(chunks)
+        ]
+        
+        # Add to collection in as few calls as Chroma's batch limit allows
+        for start in range(0, len(chunks), CHROMA_ADD_BATCH_SIZE):
+            end = start + CHROMA_ADD_BATCH_SIZE
             self.collection.add(
-                embeddings=[chunk['embedding'].tolist()],
-                documents=[chunk['content']],
-                metadatas=[metadata],
-                ids=[f"{source_file}_{i}"]
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
             )
     
-    def query(self, question: str, top_k: int = 5, filter_metadata: Optional[Dict] = None) -> List[Dict[str, Any]]:
-        """Query the RAG system"""
+    def embed_query(self, question: str) -> np.ndarray:
+        """Create a normalized query embedding, reusing it for repeated questions"""
+        embedding = self.query_embedding_cache.get(question)
+        if embedding is None:
+            embedding = self.embedder.model.encode(
+                question,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype(np.float32)
+            self.query_embedding_cache.put(question, embedding)
+        return embedding
+    
+    def embed_queries(self, questions: List[str], batch_size: int = 64) -> np.ndarray:
+        """Create normalized embeddings for a batch of queries"""
+        with torch.inference_mode():
+            return self.embedder.model.encode(
+                questions,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype(np.float32)
+    
+    def query(self, question: str, top_k: int = 5, filter_metadata: Optional[Dict] = None,
+              query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Query the RAG system, optionally with a precomputed query embedding"""
         # Create query embedding
-        query_embedding = self.embedder.model.encode(question, convert_to_tensor=True)
+        if query_embedding is None:
+            query_embedding = self.embed_query(question)
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        
+        return self._search(query_embedding[np.newaxis, :], top_k, filter_metadata)[0]
+    
+    def batch_query(self, questions: List[str], top_k: int = 5, filter_metadata: Optional[Dict] = None,
+                    query_embeddings: Optional[np.ndarray] = None) -> List[List[Dict[str, Any]]]:
+        """Query the RAG system for several questions with a single vector search"""
+        if not questions:
+            return []
         
+        # Create query embeddings
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(questions)
+        
+        return self._search(np.ascontiguousarray(query_embeddings, dtype=np.float32), top_k, filter_metadata)
+    
+    def _search(self, query_embeddings: np.ndarray, top_k: int,
+                filter_metadata: Optional[Dict] = None) -> List[List[Dict[str, Any]]]:
+        """Search the vector database and format results per query"""
         # Prepare where clause for filtering
         where_clause = None
         if filter_metadata:
@@ -473,29 +913,32 @@ class InsuranceRAGSystem:
         
         # Search in vector database
         results = self.collection.query(
-            query_embeddings=[query_embedding.cpu().numpy().tolist()],
+            query_embeddings=query_embeddings,
             n_results=top_k,
             where=where_clause,
             include=['documents', 'metadatas', 'distances']
         )
         
         # Format results
-        formatted_results = []
-        for i in range(len(results['documents'][0])):
-            formatted_results.append({
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'similarity_score': 1 - results['distances'][0][i],  # Convert distance to similarity
-                'rank': i + 1
-            })
-        
-        return formatted_results
+        all_results = []
+        for documents, metadatas, distances in zip(results['documents'], results['metadatas'], results['distances']):
+            formatted_results = []
+            for i in range(len(documents)):
+                formatted_results.append({
+                    'content': documents[i],
+                    'metadata': metadatas[i],
+                    'similarity_score': 1 - distances[i],  # cosine distance; equals the dot product for normalized embeddings
+                    'rank': i + 1
+                })
+            all_results.append(formatted_results)
+        
+        return all_results
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get system statistics"""
         stats = {
             'total_documents': len(self.processed_docs),
-            'total_chunks': sum(len(doc['chunks']) for doc in self.processed_docs.values()),
+            'total_chunks': sum(doc['metadata']['total_chunks'] for doc in self.processed_docs.values()),
             'processed_files': list(self.processed_docs.keys()),
             'vector_db_size': len(self.collection.get()['ids']) if self.collection.count() > 0 else 0
         }
@@ -504,7 +947,7 @@ class InsuranceRAGSystem:
         file_stats = {}
         for filename, data in self.processed_docs.items():
             file_stats[filename] = {
-                'chunks': len(data['chunks']),
+                'chunks': data['metadata']['total_chunks'],
                 'pages': data['metadata']['total_pages'],
                 'file_size_mb': data['metadata']['file_size'] / (1024 * 1024)
             }
@@ -0,0 +1,187 @@
+"""
+Query caches for the Insurance Policy RAG System
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+
+
+class LRUCache:
+    """
+    Thread-safe exact-match LRU cache with per-entry TTL
+    """
+
+    def __init__(self, max_size: int = 2048, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, created = entry
+            if time.monotonic() - created > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: Any) -> None:
+        """Cache a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+class SemanticCache:
+    """
+    Similarity cache mapping query embeddings to answers.
+
+    Embeddings are L2-normalized on insert so a lookup is a single
+    matrix-vector dot product over all cached entries. They live in one
+    preallocated float32 matrix; removals move the last row into the freed
+    slot, so inserts and evictions never copy the whole matrix.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._embeddings: Optional[np.ndarray] = None
+        self._answers = []
+        self._created = []
+        self._last_used = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, index: int) -> None:
+        last = len(self._answers) - 1
+        if index != last:
+            self._embeddings[index] = self._embeddings[last]
+            self._answers[index] = self._answers[last]
+            self._created[index] = self._created[last]
+            self._last_used[index] = self._last_used[last]
+        self._answers.pop()
+        self._created.pop()
+        self._last_used.pop()
+
+    def _expire(self, now: float) -> None:
+        for index in reversed(range(len(self._answers))):
+            if now - self._created[index] > self.ttl:
+                self._remove(index)
+
+    def lookup(self, embedding, threshold: float = 0.95) -> Optional[Any]:
+        """Return the cached answer whose embedding has cosine >= threshold"""
+        query = self._normalize(embedding)
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if not self._answers:
+                self.misses += 1
+                return None
+
+            scores = self._embeddings[:len(self._answers)] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._last_used[best] = now
+            return self._answers[best]
+
+    def insert(self, embedding, answer: Any, replace_threshold: Optional[float] = None) -> None:
+        """
+        Cache an answer, evicting the least recently used entry when full.
+
+        With replace_threshold, an existing entry at least that similar is
+        overwritten instead of adding a near-duplicate.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if (replace_threshold is not None and self._answers
+                    and self._embeddings.shape[1] == vector.shape[0]):
+                scores = self._embeddings[:len(self._answers)] @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= replace_threshold:
+                    self._embeddings[best] = vector
+                    self._answers[best] = answer
+                    self._created[best] = now
+                    self._last_used[best] = now
+                    return
+
+            if len(self._answers) >= self.max_size:
+                self._remove(int(np.argmin(self._last_used)))
+
+            if self._embeddings is None or self._embeddings.shape[1] != vector.shape[0]:
+                self._embeddings = np.empty((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._answers = []
+                self._created = []
+                self._last_used = []
+
+            self._embeddings[len(self._answers)] = vector
+            self._answers.append(answer)
+            self._created.append(now)
+            self._last_used.append(now)
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._embeddings = None
+            self._answers = []
+            self._created = []
+            self._last_used = []
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._answers),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -1,9 +1,96 @@
+import io
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Dict, Any, Optional, Pattern, AbstractSet
 from datetime import datetime
 import pandas as pd
-from insurance_rag_system import InsuranceRAGSystem
+from insurance_rag_system import INSURANCE_TERMS, InsuranceRAGSystem
+from query_cache import SemanticCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    try:
+        import ujson
+    except ImportError:
+        ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+QUERY_CACHE_THRESHOLD = 0.92
+QUERY_CACHE_REPLACE_THRESHOLD = 0.98
+
+# filter:key=value, where key is a metadata field name
+_FILTER_RE = re.compile(r'\s*([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.+?)\s*$')
+_FILTER_BOOLS = {'true': True, 'false': False}
+
+EXAMPLE_QUERIES = (
+    "What are the coverage limits?",
+    "What is excluded from coverage?",
+    "How much is the premium?",
+    "What are the claim procedures?",
+    "What are the policy terms and conditions?"
+)
+
+HELP_TEXT = """
+=== Help ===
+Commands:
+  help     - Show this help
+  stats    - Show system statistics
+  history  - Show query history
+  filter   - Show filtering options
+  filter:section_type=coverage - Filter by section type
+  filter:source_file=filename.pdf - Filter by source file
+  quit     - Exit the system
+
+Example queries:
+""" + "".join(f"  {example}\n" for example in EXAMPLE_QUERIES)
+
+FILTER_OPTIONS_TEXT = """
+=== Filter Options ===
+Available filters:
+  section_type: coverage, exclusion, definition, condition, premium, claim, schedule, general
+  chunk_type: text, table
+  source_file: [filename.pdf]
+  has_table_data: true/false
+  has_legal_terms: true/false
+
+Usage: filter:key=value
+Example: filter:section_type=coverage
+"""
+
+# Test queries per embed + search call during evaluation
+EVAL_BATCH_SIZE = int(os.getenv("EVAL_BATCH_SIZE", "64"))
+
+logger = logging.getLogger(__name__)
+
+def _write_json(data: Any, output_file: str) -> None:
+    """Write compact JSON with the fastest available encoder"""
+    if orjson is not None:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
+    elif ujson is not None:
+        with open(output_file, 'w') as f:
+            ujson.dump(data, f)
+    else:
+        with open(output_file, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+def load_detailed_results(path: str) -> List[Dict[str, Any]]:
+    """Load detailed evaluation results written by QueryEvaluator.generate_report"""
+    if path.endswith('.msgpack'):
+        with open(path, 'rb') as f:
+            return msgpack.unpackb(f.read(), raw=False)
+    with open(path) as f:
+        return json.load(f)
 
 class InsuranceQueryInterface:
     """
@@ -12,98 +99,140 @@ class InsuranceQueryInterface:
     
     def __init__(self, rag_system: InsuranceRAGSystem):
         self.rag_system = rag_system
-        self.query_history = []
+        # Query history stored column-wise, one list per field
+        self.query_history: Dict[str, list] = {
+            'query': [], 'timestamp': [], 'filter': [],
+            'cache_hit': [], 'results_count': [], 'top_score': []
+        }
+        # One semantic cache per (top_k, filter) so cached results never cross filters
+        self.query_caches: Dict[tuple, SemanticCache] = {}
+        # Warms the cache with example queries while the user types the next one
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetch_future = None
         
     def interactive_query(self) -> None:
         """Interactive query interface"""
         print("=== Insurance Policy RAG System ===")
         print("Type 'quit' to exit, 'help' for commands, 'stats' for statistics")
         
+        commands = {
+            'help': self._show_help,
+            'stats': self._show_statistics,
+            'history': self._show_query_history,
+            'filter': self._show_filter_options
+        }
+        
         while True:
             try:
                 query = input("\nEnter your question: ").strip()
+                query_lower = query.lower()
                 
-                if query.lower() == 'quit':
+                if query_lower == 'quit':
                     break
-                elif query.lower() == 'help':
-                    self._show_help()
-                elif query.lower() == 'stats':
-                    self._show_statistics()
-                elif query.lower() == 'history':
-                    self._show_query_history()
-                elif query.lower() == 'filter':
-                    self._show_filter_options()
-                elif query.lower().startswith('filter:'):
+                
+                handler = commands.get(query_lower)
+                if handler is not None:
+                    handler()
+                elif query_lower.startswith('filter:'):
                     self._handle_filtered_query(query[7:])
                 else:
                     self._process_query(query)
+                    self._prefetch_next()
                     
             except KeyboardInterrupt:
                 print("\nExiting...")
                 break
             except Exception as e:
                 print(f"Error: {e}")
+        
+        self._prefetch_executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _get_query_cache(self, top_k: int, filter_metadata: Optional[Dict]) -> SemanticCache:
+        """Return the semantic cache for a (top_k, filter) combination"""
+        cache_key = (top_k, json.dumps(filter_metadata, sort_keys=True))
+        cache = self.query_caches.get(cache_key)
+        if cache is None:
+            cache = self.query_caches.setdefault(cache_key, SemanticCache(max_size=1000, ttl=300))
+        return cache
+    
+    def _prefetch_next(self) -> None:
+        """Speculatively run the next unasked example query in the background"""
+        if self._prefetch_future is not None and not self._prefetch_future.done():
+            return
+        
+        asked = {query.lower() for query in self.query_history['query']}
+        for query in EXAMPLE_QUERIES:
+            if query.lower() not in asked:
+                self._prefetch_future = self._prefetch_executor.submit(self._warm_cache, query)
+                return
+    
+    def _warm_cache(self, query: str, top_k: int = 5) -> None:
+        """Embed and search a query so a later identical question hits the cache"""
+        try:
+            cache = self._get_query_cache(top_k, None)
+            query_embedding = self.rag_system.embed_query(query)
+            if cache.lookup(query_embedding, threshold=QUERY_CACHE_THRESHOLD) is None:
+                results = self.rag_system.query(query, top_k=top_k, query_embedding=query_embedding)
+                cache.insert(query_embedding, results, replace_threshold=QUERY_CACHE_REPLACE_THRESHOLD)
+        except Exception as e:
+            logger.debug(f"Prefetch failed for '{query}': {e}")
     
     def _process_query(self, query: str, top_k: int = 5, filter_metadata: Optional[Dict] = None) -> None:
         """Process a query and display results"""
         print(f"\nSearching for: '{query}'")
         print("-" * 50)
         
-        # Record query
-        query_record = {
-            'query': query,
-            'timestamp': datetime.now().isoformat(),
-            'filter': filter_metadata
-        }
+        timestamp = datetime.now().isoformat()
         
-        # Get results
-        results = self.rag_system.query(query, top_k=top_k, filter_metadata=filter_metadata)
+        # Get results, reusing those of a near-duplicate earlier query
+        cache = self._get_query_cache(top_k, filter_metadata)
+        query_embedding = self.rag_system.embed_query(query)
+        results = cache.lookup(query_embedding, threshold=QUERY_CACHE_THRESHOLD)
+        cache_hit = results is not None
+        if not cache_hit:
+            results = self.rag_system.query(query, top_k=top_k, filter_metadata=filter_metadata,
+                                            query_embedding=query_embedding)
+            cache.insert(query_embedding, results, replace_threshold=QUERY_CACHE_REPLACE_THRESHOLD)
         
         if not results:
             print("No relevant results found.")
             return
         
-        # Display results
+        # Display results, buffered and written in one call
+        output = io.StringIO()
         for i, result in enumerate(results, 1):
-            print(f"\n{i}. Similarity Score: {result['similarity_score']:.3f}")
-            print(f"   Source: {result['metadata']['source_file']}")
-            print(f"   Section: {result['metadata']['section_type']}")
-            print(f"   Type: {result['metadata']['chunk_type']}")
+            metadata = result['metadata']
+            output.write(
+                f"\n{i}. Similarity Score: {result['similarity_score']:.3f}\n"
+                f"   Source: {metadata['source_file']}\n"
+                f"   Section: {metadata['section_type']}\n"
+                f"   Type: {metadata['chunk_type']}\n"
+            )
             
             # Show insurance terms found
-            if 'insurance_terms' in result['metadata']:
-                terms = {k: v for k, v in result['metadata']['insurance_terms'].items() if v > 0}
-                if terms:
-                    print(f"   Insurance Terms: {', '.join(terms.keys())}")
+            mask = metadata.get('insurance_terms_mask', 0)
+            if mask:
+                terms = [term for i, term in enumerate(INSURANCE_TERMS) if mask >> i & 1]
+                output.write(f"   Insurance Terms: {', '.join(terms)}\n")
             
             # Show content preview
             content = result['content']
-            if len(content) > 300:
-                content = content[:300] + "..."
-            print(f"   Content: {content}")
+            preview = content if len(content) <= 300 else content[:300] + "..."
+            output.write(f"   Content: {preview}\n")
+        sys.stdout.write(output.getvalue())
         
-        # Record results
-        query_record['results_count'] = len(results)
-        query_record['top_score'] = results[0]['similarity_score'] if results else 0
-        self.query_history.append(query_record)
+        # Record query and results
+        history = self.query_history
+        history['query'].append(query)
+        history['timestamp'].append(timestamp)
+        history['filter'].append(filter_metadata)
+        history['cache_hit'].append(cache_hit)
+        history['results_count'].append(len(results))
+        history['top_score'].append(results[0]['similarity_score'] if results else 0)
     
     def _show_help(self) -> None:
         """Show help information"""
-        print("\n=== Help ===")
-        print("Commands:")
-        print("  help     - Show this help")
-        print("  stats    - Show system statistics")
-        print("  history  - Show query history")
-        print("  filter   - Show filtering options")
-        print("  filter:section_type=coverage - Filter by section type")
-        print("  filter:source_file=filename.pdf - Filter by source file")
-        print("  quit     - Exit the system")
-        print("\nExample queries:")
-        print("  What are the coverage limits?")
-        print("  What is excluded from coverage?")
-        print("  How much is the premium?")
-        print("  What are the claim procedures?")
-        print("  What are the policy terms and conditions?")
+        sys.stdout.write(HELP_TEXT)
     
     def _show_statistics(self) -> None:
         """Show system statistics"""
@@ -120,59 +249,52 @@ class InsuranceQueryInterface:
             print(f"    Pages: {file_stats['pages']}")
             print(f"    Size: {file_stats['file_size_mb']:.2f} MB")
         
-        print(f"\nQuery History: {len(self.query_history)} queries")
+        print(f"\nQuery History: {len(self.query_history['query'])} queries")
+        print(f"Query Cache Hits: {sum(self.query_history['cache_hit'])}")
     
     def _show_query_history(self) -> None:
         """Show query history"""
-        if not self.query_history:
+        history = self.query_history
+        total = len(history['query'])
+        if not total:
             print("No query history available.")
             return
         
         print("\n=== Query History ===")
-        for i, record in enumerate(self.query_history[-10:], 1):  # Show last 10
-            print(f"{i}. Query: {record['query']}")
-            print(f"   Results: {record['results_count']}")
-            print(f"   Top Score: {record['top_score']:.3f}")
-            print(f"   Time: {record['timestamp']}")
-            if record['filter']:
-                print(f"   Filter: {record['filter']}")
+        for i, index in enumerate(range(max(0, total - 10), total), 1):  # Show last 10
+            print(f"{i}. Query: {history['query'][index]}")
+            print(f"   Results: {history['results_count'][index]}")
+            print(f"   Top Score: {history['top_score'][index]:.3f}")
+            print(f"   Time: {history['timestamp'][index]}")
+            if history['filter'][index]:
+                print(f"   Filter: {history['filter'][index]}")
             print()
     
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return the query history as a DataFrame"""
+        return pd.DataFrame(self.query_history)
+    
     def _show_filter_options(self) -> None:
         """Show available filtering options"""
-        print("\n=== Filter Options ===")
-        print("Available filters:")
-        print("  section_type: coverage, exclusion, definition, condition, premium, claim, schedule, general")
-        print("  chunk_type: text, table")
-        print("  source_file: [filename.pdf]")
-        print("  has_table_data: true/false")
-        print("  has_legal_terms: true/false")
-        print("\nUsage: filter:key=value")
-        print("Example: filter:section_type=coverage")
+        sys.stdout.write(FILTER_OPTIONS_TEXT)
     
     def _handle_filtered_query(self, filter_str: str) -> None:
         """Handle filtered query"""
+        # Parse filter, converting boolean values
+        match = _FILTER_RE.match(filter_str)
+        if match is None:
+            print("Invalid filter format. Use: filter:key=value")
+            return
+        
+        key, value = match.groups()
+        filter_metadata = {key: _FILTER_BOOLS.get(value.lower(), value)}
+        
         try:
-            # Parse filter
-            key, value = filter_str.split('=', 1)
-            key = key.strip()
-            value = value.strip()
-            
-            # Convert boolean values
-            if value.lower() == 'true':
-                value = True
-            elif value.lower() == 'false':
-                value = False
-            
-            filter_metadata = {key: value}
-            
             # Get query
             query = input("Enter your question: ").strip()
             if query:
                 self._process_query(query, filter_metadata=filter_metadata)
                 
-        except ValueError:
-            print("Invalid filter format. Use: filter:key=value")
         except Exception as e:
             print(f"Filter error: {e}")
 
@@ -185,8 +307,9 @@ class QueryEvaluator:
         self.rag_system = rag_system
         self.evaluation_results = []
     
-    def evaluate_queries(self, test_queries: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Evaluate a set of test queries"""
+    def evaluate_queries(self, test_queries: List[Dict[str, Any]],
+                         on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Evaluate a set of test queries, passing each (test case, evaluation) to on_result"""
         print("Evaluating queries...")
         
         total_queries = len(test_queries)
@@ -194,19 +317,26 @@ class QueryEvaluator:
         total_recall = 0
         total_f1 = 0
         
-        for i, test_case in enumerate(test_queries, 1):
+        # Embed and search test queries in batches, scoring one batch while
+        # the next is retrieved
+        queries = [test_case['query'] for test_case in test_queries]
+        all_results = self._iter_batch_results(queries, top_k=5)
+        
+        for test_case, results in zip(test_queries, all_results):
             query = test_case['query']
             expected_sections = test_case.get('expected_sections', [])
             expected_keywords = test_case.get('expected_keywords', [])
             
-            print(f"Evaluating query {i}/{total_queries}: {query}")
-            
-            # Get results
-            results = self.rag_system.query(query, top_k=5)
+            # Compile expectations once per test case; frozenset() returns an
+            # already-frozen expected_sections as-is
+            keyword_re = re.compile(
+                '|'.join(re.escape(keyword) for keyword in expected_keywords), re.IGNORECASE
+            ) if expected_keywords else None
             
             # Calculate metrics
             precision, recall, f1 = self._calculate_metrics(
-                results, expected_sections, expected_keywords
+                results, frozenset(expected_sections), keyword_re,
+                len(expected_sections) + len(expected_keywords)
             )
             
             total_precision += precision
@@ -223,6 +353,8 @@ class QueryEvaluator:
                 'top_score': results[0]['similarity_score'] if results else 0
             }
             self.evaluation_results.append(evaluation)
+            if on_result is not None:
+                on_result(test_case, evaluation)
         
         # Calculate averages
         avg_precision = total_precision / total_queries
@@ -237,33 +369,38 @@ class QueryEvaluator:
             'detailed_results': self.evaluation_results
         }
     
-    def _calculate_metrics(self, results: List[Dict], expected_sections: List[str], 
-                          expected_keywords: List[str]) -> tuple:
+    def _iter_batch_results(self, queries: List[str], top_k: int = 5,
+                            batch_size: int = EVAL_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """Yield results per query, prefetching the next batch in a worker thread"""
+        batches = [queries[start:start + batch_size] for start in range(0, len(queries), batch_size)]
+        if not batches:
+            return
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self.rag_system.batch_query, batches[0], top_k=top_k)
+            for next_batch in batches[1:] + [None]:
+                batch_results = future.result()
+                if next_batch is not None:
+                    future = executor.submit(self.rag_system.batch_query, next_batch, top_k=top_k)
+                yield from batch_results
+    
+    def _calculate_metrics(self, results: List[Dict], expected_sections: AbstractSet[str],
+                          keyword_re: Optional[Pattern], expected_count: int) -> tuple:
         """Calculate precision, recall, and F1 score"""
         if not results:
             return 0.0, 0.0, 0.0
         
-        # Count relevant results
+        # Count relevant results by section type or keyword match
         relevant_count = 0
         for result in results:
-            is_relevant = False
-            
-            # Check section type
-            if expected_sections:
-                if result['metadata']['section_type'] in expected_sections:
-                    is_relevant = True
-            
-            # Check keywords
-            if expected_keywords:
-                content_lower = result['content'].lower()
-                if any(keyword.lower() in content_lower for keyword in expected_keywords):
-                    is_relevant = True
-            
-            if is_relevant:
+            metadata = result['metadata']
+            content = result['content']
+            if (metadata['section_type'] in expected_sections
+                    or (keyword_re is not None and keyword_re.search(content) is not None)):
                 relevant_count += 1
         
         precision = relevant_count / len(results)
-        recall = relevant_count / max(len(expected_sections) + len(expected_keywords), 1)
+        recall = relevant_count / max(expected_count, 1)
         
         # Calculate F1 score
         if precision + recall > 0:
@@ -279,33 +416,60 @@ class QueryEvaluator:
             print("No evaluation results available.")
             return
         
-        # Calculate summary statistics
-        precisions = [r['precision'] for r in self.evaluation_results]
-        recalls = [r['recall'] for r in self.evaluation_results]
-        f1_scores = [r['f1_score'] for r in self.evaluation_results]
+        # Calculate summary statistics in a single pass
+        total_queries = len(self.evaluation_results)
+        sum_p = sum_r = sum_f = 0.0
+        min_p = min_r = min_f = float('inf')
+        max_p = max_r = max_f = float('-inf')
+        for r in self.evaluation_results:
+            p, rc, f1 = r['precision'], r['recall'], r['f1_score']
+            sum_p += p
+            sum_r += rc
+            sum_f += f1
+            if p < min_p:
+                min_p = p
+            if p > max_p:
+                max_p = p
+            if rc < min_r:
+                min_r = rc
+            if rc > max_r:
+                max_r = rc
+            if f1 < min_f:
+                min_f = f1
+            if f1 > max_f:
+                max_f = f1
+        
+        summary = {
+            'total_queries': total_queries,
+            'average_precision': sum_p / total_queries,
+            'average_recall': sum_r / total_queries,
+            'average_f1': sum_f / total_queries,
+            'min_precision': min_p,
+            'max_precision': max_p,
+            'min_recall': min_r,
+            'max_recall': max_r,
+            'min_f1': min_f,
+            'max_f1': max_f
+        }
+        # Detailed results are machine-read only; write them in binary when possible
+        base_name = os.path.splitext(output_file)[0]
+        if msgpack is not None:
+            details_file = base_name + ".msgpack"
+            with open(details_file, 'wb') as f:
+                f.write(msgpack.packb(self.evaluation_results, use_bin_type=True, default=float))
+        else:
+            details_file = base_name + "_details.json"
+            _write_json(self.evaluation_results, details_file)
         
         report = {
-            'summary': {
-                'total_queries': len(self.evaluation_results),
-                'average_precision': sum(precisions) / len(precisions),
-                'average_recall': sum(recalls) / len(recalls),
-                'average_f1': sum(f1_scores) / len(f1_scores),
-                'min_precision': min(precisions),
-                'max_precision': max(precisions),
-                'min_recall': min(recalls),
-                'max_recall': max(recalls),
-                'min_f1': min(f1_scores),
-                'max_f1': max(f1_scores)
-            },
-            'detailed_results': self.evaluation_results,
+            'summary': summary,
+            'detailed_results_file': details_file,
             'timestamp': datetime.now().isoformat()
         }
-        
-        # Save report
         with open(output_file, 'w') as f:
             json.dump(report, f, indent=2)
         
-        print(f"Evaluation report saved to {output_file}")
+        print(f"Evaluation report saved to {output_file} (details: {details_file})")
         
         # Display summary
         print("\n=== Evaluation Summary ===")
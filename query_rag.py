@@ -4,27 +4,45 @@ Simple query interface for the Insurance Policy RAG System
 """
 
 import json
+import sys
 import time
 from insurance_rag_no_spacy import InsuranceRAGSystem
+from query_cache import LRUCache, SemanticCache
+
+EXAMPLE_QUERIES = (
+    "What are the coverage limits?",
+    "What is excluded from coverage?",
+    "How much is the premium?",
+    "What are the claim procedures?",
+    "What are the policy terms and conditions?",
+    "What is the waiting period?",
+    "What are the benefits covered?",
+    "What is the sum insured?",
+    "What are the exclusions?",
+    "How to file a claim?"
+)
+
+# Numbered example list, formatted once at import
+EXAMPLES_TEXT = "".join(f"{i}. {query}\n" for i, query in enumerate(EXAMPLE_QUERIES, 1))
+
+_RULE = "=" * 60
 
 def print_header(title):
     """Print formatted header"""
-    print("\n" + "="*60)
-    print(f"  {title}")
-    print("="*60)
+    sys.stdout.write(f"\n{_RULE}\n  {title}\n{_RULE}\n")
 
 def print_result(result, index):
     """Print formatted result"""
-    print(f"\n{index}. Similarity Score: {result['similarity_score']:.3f}")
-    print(f"   Source: {result['metadata']['source_file']}")
-    print(f"   Section: {result['metadata']['section_type']}")
-    print(f"   Type: {result['metadata']['chunk_type']}")
-    
-    # Show content preview
     content = result['content']
-    if len(content) > 300:
-        content = content[:300] + "..."
-    print(f"   Content: {content}")
+    preview = content if len(content) <= 300 else content[:300] + "..."
+    metadata = result['metadata']
+    sys.stdout.write(
+        f"\n{index}. Similarity Score: {result['similarity_score']:.3f}\n"
+        f"   Source: {metadata['source_file']}\n"
+        f"   Section: {metadata['section_type']}\n"
+        f"   Type: {metadata['chunk_type']}\n"
+        f"   Content: {preview}\n"
+    )
 
 def main():
     """Main query interface"""
@@ -35,37 +53,37 @@ def main():
     print("Initializing RAG system...")
     rag_system = InsuranceRAGSystem("./Training_pdfs")
     
+    # Statistics scan the whole collection, so share one result for a few seconds
+    stats_cache = LRUCache(max_size=1, ttl=5)
+    
+    def get_statistics():
+        stats = stats_cache.get('stats')
+        if stats is None:
+            stats = rag_system.get_statistics()
+            stats_cache.put('stats', stats)
+        return stats
+    
     # Check if documents are processed
-    stats = rag_system.get_statistics()
+    stats = get_statistics()
     if stats['total_documents'] == 0:
         print("No documents processed. Processing PDFs...")
         rag_system.process_pdfs()
+        stats_cache.clear()
         print("Document processing completed!")
     
     # Show statistics
     print_header("SYSTEM STATISTICS")
-    stats = rag_system.get_statistics()
+    stats = get_statistics()
     print(f"Total Documents: {stats['total_documents']}")
     print(f"Total Chunks: {stats['total_chunks']}")
     print(f"Vector DB Size: {stats['vector_db_size']}")
     
     # Example queries
-    example_queries = [
-        "What are the coverage limits?",
-        "What is excluded from coverage?",
-        "How much is the premium?",
-        "What are the claim procedures?",
-        "What are the policy terms and conditions?",
-        "What is the waiting period?",
-        "What are the benefits covered?",
-        "What is the sum insured?",
-        "What are the exclusions?",
-        "How to file a claim?"
-    ]
-    
     print_header("EXAMPLE QUERIES")
-    for i, query in enumerate(example_queries, 1):
-        print(f"{i}. {query}")
+    sys.stdout.write(EXAMPLES_TEXT)
+    
+    # Results of earlier queries, reused for near-duplicate questions
+    query_cache = SemanticCache(max_size=1000, ttl=300)
     
     # Interactive query mode
     print_header("INTERACTIVE QUERY MODE")
@@ -78,15 +96,13 @@ def main():
             if query.lower() == 'quit':
                 break
             elif query.lower() == 'stats':
-                stats = rag_system.get_statistics()
+                stats = get_statistics()
                 print(f"\nTotal Documents: {stats['total_documents']}")
                 print(f"Total Chunks: {stats['total_chunks']}")
                 print(f"Vector DB Size: {stats['vector_db_size']}")
                 continue
             elif query.lower() == 'examples':
-                print("\nExample queries:")
-                for i, q in enumerate(example_queries, 1):
-                    print(f"{i}. {q}")
+                sys.stdout.write("\nExample queries:\n" + EXAMPLES_TEXT)
                 continue
             elif not query:
                 continue
@@ -94,12 +110,18 @@ def main():
             print(f"\nSearching for: '{query}'")
             print("-" * 50)
             
-            start_time = time.time()
-            results = rag_system.query(query, top_k=5)
-            query_time = time.time() - start_time
+            start_ns = time.perf_counter_ns()
+            query_embedding = rag_system.embed_query(query)
+            results = query_cache.lookup(query_embedding, threshold=0.92)
+            cache_hit = results is not None
+            if not cache_hit:
+                results = rag_system.query(query, top_k=5, query_embedding=query_embedding)
+                query_cache.insert(query_embedding, results, replace_threshold=0.98)
+            query_ms = (time.perf_counter_ns() - start_ns) / 1e6
             
             if results:
-                print(f"Found {len(results)} results in {query_time:.2f} seconds")
+                cached = " (cached)" if cache_hit else ""
+                print(f"Found {len(results)} results in {query_ms:.2f} ms{cached}")
                 for i, result in enumerate(results, 1):
                     print_result(result, i)
             else:
@@ -5,20 +5,41 @@ Setup script for Insurance Policy RAG System
 
 import os
 import sys
+import shlex
 import subprocess
 import platform
+import importlib.util
+
+# (module, display name) pairs checked without importing the module
+REQUIRED_MODULES = (
+    ("pypdf", "pypdf"),
+    ("pdfplumber", "PDFPlumber"),
+    ("sentence_transformers", "Sentence Transformers"),
+    ("chromadb", "ChromaDB"),
+)
 
 def run_command(command, description):
-    """Run a command and handle errors"""
+    """Run a command without a shell, streaming its output, and handle errors"""
     print(f"Running: {description}")
+    args = shlex.split(command) if isinstance(command, str) else command
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-        print(f"✓ {description} completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, bufsize=1)
+    except OSError as e:
         print(f"✗ {description} failed: {e}")
-        print(f"Error output: {e.stderr}")
         return False
+    
+    with process.stdout:
+        for line in process.stdout:
+            print(line, end='')
+    
+    returncode = process.wait()
+    if returncode != 0:
+        print(f"✗ {description} failed with exit code {returncode}")
+        return False
+    
+    print(f"✓ {description} completed successfully")
+    return True
 
 def check_python_version():
     """Check if Python version is compatible"""
@@ -46,16 +67,18 @@ def download_models():
     if not run_command("python -m spacy download en_core_web_sm", "Downloading spaCy English model"):
         return False
     
-    # Download NLTK data
-    nltk_commands = [
-        "python -c \"import nltk; nltk.download('punkt')\"",
-        "python -c \"import nltk; nltk.download('stopwords')\"",
-        "python -c \"import nltk; nltk.download('averaged_perceptron_tagger')\""
-    ]
-    
-    for cmd in nltk_commands:
-        if not run_command(cmd, "Downloading NLTK data"):
+    # Download NLTK data in-process, in one call
+    print("Running: Downloading NLTK data")
+    try:
+        importlib.invalidate_caches()  # nltk may have just been installed
+        import nltk
+        if not nltk.download(['punkt', 'stopwords', 'averaged_perceptron_tagger'], quiet=True):
+            print("✗ Downloading NLTK data failed")
             return False
+    except ImportError as e:
+        print(f"✗ Downloading NLTK data failed: {e}")
+        return False
+    print("✓ Downloading NLTK data completed successfully")
     
     return True
 
@@ -83,40 +106,20 @@ def test_imports():
     """Test if all imports work correctly"""
     print("\n=== Testing Imports ===")
     
-    try:
-        import pypdf2
-        print("✓ PyPDF2 imported successfully")
-    except ImportError as e:
-        print(f"✗ PyPDF2 import failed: {e}")
-        return False
-    
-    try:
-        import pdfplumber
-        print("✓ PDFPlumber imported successfully")
-    except ImportError as e:
-        print(f"✗ PDFPlumber import failed: {e}")
-        return False
-    
-    try:
-        import sentence_transformers
-        print("✓ Sentence Transformers imported successfully")
-    except ImportError as e:
-        print(f"✗ Sentence Transformers import failed: {e}")
-        return False
-    
-    try:
-        import chromadb
-        print("✓ ChromaDB imported successfully")
-    except ImportError as e:
-        print(f"✗ ChromaDB import failed: {e}")
-        return False
+    for module, name in REQUIRED_MODULES:
+        if importlib.util.find_spec(module) is None:
+            print(f"✗ {name} not installed")
+            return False
+        print(f"✓ {name} available")
     
     try:
         import spacy
-        nlp = spacy.load("en_core_web_sm")
-        print("✓ spaCy model loaded successfully")
-    except Exception as e:
-        print(f"✗ spaCy model loading failed: {e}")
+        if not spacy.util.is_package("en_core_web_sm"):
+            print("✗ spaCy model en_core_web_sm not installed")
+            return False
+        print("✓ spaCy model available")
+    except ImportError as e:
+        print(f"✗ spaCy import failed: {e}")
         return False
     
     try:
@@ -7,24 +7,32 @@ import os
 import subprocess
 import sys
 from pathlib import Path
+from _deps import REQUIRED_MODULES, is_present
 
 def run_command(command, description):
-    """Run a command and handle errors"""
+    """Run a command given as an argument list, without a shell, and handle errors"""
     print(f"Running: {description}")
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        # close_fds=False lets CPython start the child with posix_spawn; stdout
+        # is discarded and stderr kept as bytes, decoded only on failure
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE, close_fds=False)
         print(f"✓ {description} completed successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"✗ {description} failed: {e}")
-        print(f"Error output: {e.stderr}")
+        print(f"Error output: {e.stderr.decode('utf-8', errors='replace')}")
+        return False
+    except OSError as e:
+        print(f"✗ {description} failed: {e}")
         return False
 
 def install_dependencies():
     """Install API dependencies"""
     print("\n=== Installing API Dependencies ===")
     
-    if not run_command("pip install -r requirements_api.txt", "Installing API dependencies"):
+    if not run_command([sys.executable, "-m", "pip", "install", "-r", "requirements_api.txt"],
+                       "Installing API dependencies"):
         print("Failed to install API dependencies")
         return False
     
@@ -53,30 +61,22 @@ def setup_environment():
 
 def test_imports():
     """Test if all required modules can be imported"""
-    print("\n=== Testing API Imports ===")
-    
-    required_modules = [
-        "fastapi",
-        "uvicorn",
-        "httpx",
-        "pydantic",
-        "loguru"
-    ]
+    lines = ["\n=== Testing API Imports ==="]
     
     all_working = True
-    for module in required_modules:
-        try:
-            __import__(module)
-            print(f"✓ {module} imported successfully")
-        except ImportError as e:
-            print(f"✗ {module} import failed: {e}")
+    for module in REQUIRED_MODULES:
+        if is_present(module):
+            lines.append(f"✓ {module} available")
+        else:
+            lines.append(f"✗ {module} not installed")
             all_working = False
     
+    print(*lines, sep="\n")
     return all_working
 
 def create_directories():
     """Create necessary directories"""
-    print("\n=== Creating Directories ===")
+    lines = ["\n=== Creating Directories ==="]
     
     directories = [
         "logs",
@@ -84,12 +84,16 @@ def create_directories():
         "temp"
     ]
     
+    # One directory listing instead of a stat per directory
+    existing = {entry.name for entry in os.scandir('.')}
     for directory in directories:
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-            print(f"✓ Created directory: {directory}")
+        if directory not in existing:
+            os.makedirs(directory, exist_ok=True)
+            lines.append(f"✓ Created directory: {directory}")
         else:
-            print(f"✓ Directory already exists: {directory}")
+            lines.append(f"✓ Directory already exists: {directory}")
+    
+    print(*lines, sep="\n")
 
 def main():
     """Main setup function"""
@@ -114,13 +118,14 @@ def main():
     # Create directories
     create_directories()
     
-    print("\n" + "=" * 50)
-    print("✓ API setup completed successfully!")
-    print("\nNext steps:")
-    print("1. Update GROQ_API_KEY in .env file with your actual Groq API key")
-    print("2. Start the API server: python api_backend.py")
-    print("3. Test the API: python test_api_client.py")
-    print("4. Access API documentation: http://localhost:8000/docs")
+    print("\n" + "=" * 50,
+          "✓ API setup completed successfully!",
+          "\nNext steps:",
+          "1. Update GROQ_API_KEY in .env file with your actual Groq API key",
+          "2. Start the API server: python api_backend.py",
+          "3. Test the API: python test_api_client.py",
+          "4. Access API documentation: http://localhost:8000/docs",
+          sep="\n")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -6,9 +6,8 @@ Environment setup script for Insurance Policy RAG API
 import os
 from pathlib import Path
 
-def create_env_file():
-    """Create .env file with proper configuration"""
-    env_content = """# Insurance Policy RAG API Environment Variables
+# Template for a new .env file, written as-is
+_ENV_TEMPLATE = b"""# Insurance Policy RAG API Environment Variables
 
 # Groq API Configuration
 # Get your API key from: https://console.groq.com/
@@ -24,14 +23,16 @@ PORT=8000
 # Logging Configuration
 LOG_LEVEL=INFO
 """
-    
+
+def create_env_file():
+    """Create .env file with proper configuration"""
     env_file = Path(".env")
     if not env_file.exists():
-        with open(env_file, "w") as f:
-            f.write(env_content)
-        print("✓ Created .env file")
-        print("⚠️ Please update GROQ_API_KEY in .env file with your actual Groq API key")
-        print("   Get your API key from: https://console.groq.com/")
+        env_file.write_bytes(_ENV_TEMPLATE)
+        print("✓ Created .env file",
+              "⚠️ Please update GROQ_API_KEY in .env file with your actual Groq API key",
+              "   Get your API key from: https://console.groq.com/",
+              sep="\n")
     else:
         print("✓ .env file already exists")
     
@@ -54,17 +55,19 @@ def validate_env():
     groq_key = os.getenv("GROQ_API_KEY")
     api_token = os.getenv("API_TOKEN")
     
+    lines = []
     if not groq_key or groq_key == "your-groq-api-key-here":
-        print("⚠️ GROQ_API_KEY not configured or using default value")
-        print("   Please set your actual Groq API key in .env file")
+        lines.append("⚠️ GROQ_API_KEY not configured or using default value")
+        lines.append("   Please set your actual Groq API key in .env file")
     else:
-        print("✓ GROQ_API_KEY configured")
+        lines.append("✓ GROQ_API_KEY configured")
     
     if api_token:
-        print("✓ API_TOKEN configured")
+        lines.append("✓ API_TOKEN configured")
     else:
-        print("✗ API_TOKEN not configured")
+        lines.append("✗ API_TOKEN not configured")
     
+    print(*lines, sep="\n")
     return True
 
 def main():
@@ -78,12 +81,13 @@ def main():
     # Validate environment
     validate_env()
     
-    print("\n" + "=" * 50)
-    print("✓ Environment setup completed!")
-    print("\nNext steps:")
-    print("1. Edit .env file and add your Groq API key")
-    print("2. Start the API server: python api_backend.py")
-    print("3. Test the API: python test_api_client.py")
+    print("\n" + "=" * 50,
+          "✓ Environment setup completed!",
+          "\nNext steps:",
+          "1. Edit .env file and add your Groq API key",
+          "2. Start the API server: python api_backend.py",
+          "3. Test the API: python test_api_client.py",
+          sep="\n")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
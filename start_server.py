@@ -7,49 +7,41 @@ import subprocess
 import time
 import sys
 import os
-from pathlib import Path
+from _deps import REQUIRED_MODULES, is_present
 
 def check_dependencies():
     """Check if all dependencies are installed"""
-    print("Checking dependencies...")
-    
-    required_modules = [
-        "fastapi",
-        "uvicorn", 
-        "httpx",
-        "pydantic",
-        "loguru",
-        "dotenv"
-    ]
+    lines = ["Checking dependencies..."]
     
     missing_modules = []
-    for module in required_modules:
-        try:
-            __import__(module)
-            print(f"✓ {module}")
-        except ImportError:
-            print(f"✗ {module} - missing")
+    for module in REQUIRED_MODULES:
+        if is_present(module):
+            lines.append(f"✓ {module}")
+        else:
+            lines.append(f"✗ {module} - missing")
             missing_modules.append(module)
     
     if missing_modules:
-        print(f"\nMissing modules: {', '.join(missing_modules)}")
-        print("Install with: pip install -r requirements_api.txt")
-        return False
+        lines.append(f"\nMissing modules: {', '.join(missing_modules)}")
+        lines.append("Install with: pip install -r requirements_api.txt")
     
-    return True
+    print(*lines, sep="\n")
+    return not missing_modules
 
 def check_environment():
     """Check environment setup"""
     print("\nChecking environment...")
     
+    entries = set(os.listdir('.'))
+    
     # Check .env file
-    if not Path(".env").exists():
+    if ".env" not in entries:
         print("✗ .env file not found")
         print("Run: python setup_env.py")
         return False
     
     # Check vector database
-    if not Path("vector_db").exists():
+    if "vector_db" not in entries:
         print("✗ Vector database not found")
         return False
     
@@ -58,21 +50,27 @@ def check_environment():
 
 def start_server():
     """Start the API server"""
-    print("\nStarting API server...")
-    print("Server will be available at: http://localhost:8000")
-    print("API documentation: http://localhost:8000/docs")
-    print("Press Ctrl+C to stop the server")
-    print("-" * 50)
+    print("\nStarting API server...",
+          "Server will be available at: http://localhost:8000",
+          "API documentation: http://localhost:8000/docs",
+          "Press Ctrl+C to stop the server",
+          "-" * 50,
+          sep="\n")
     
     try:
-        # Start uvicorn server
-        subprocess.run([
+        # Start uvicorn server; --reload adds a file-watcher process, so it
+        # is only used when UVICORN_RELOAD is set for development
+        command = [
             sys.executable, "-m", "uvicorn", 
             "api_backend:app", 
             "--host", "0.0.0.0", 
-            "--port", "8000",
-            "--reload"
-        ])
+            "--port", "8000"
+        ]
+        if os.getenv("UVICORN_RELOAD", "").lower() in ("1", "true"):
+            command.append("--reload")
+        
+        # close_fds=False lets CPython start the child with posix_spawn
+        subprocess.run(command, close_fds=False)
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except Exception as e:
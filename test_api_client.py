@@ -3,34 +3,49 @@
 Test client for the Insurance Policy RAG API
 """
 
-import requests
-import json
+import asyncio
+import httpx
+import orjson
 import time
 import os
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-# Load environment variables
-load_dotenv()
+# Parse .env once into a dict; real environment variables take precedence,
+# as with load_dotenv()
+_ENV = {**dotenv_values(".env"), **os.environ}
 
 # API Configuration
 BASE_URL = "http://localhost:8000"
-API_TOKEN = os.getenv("API_TOKEN", "c94dfd1ae12b50eb392cd6d1ef5f4578c561f54bacf6cd6849236cbfc2e8b673")
+API_TOKEN = _ENV.get("API_TOKEN") or "c94dfd1ae12b50eb392cd6d1ef5f4578c561f54bacf6cd6849236cbfc2e8b673"
 HEADERS = {
     "Authorization": f"Bearer {API_TOKEN}",
     "Content-Type": "application/json",
     "Accept": "application/json"
 }
 
-def test_health_check():
+# How long to wait for a server that is still warming up its RAG system
+WARMUP_TIMEOUT = float(_ENV.get("WARMUP_TIMEOUT") or 60)
+WARMUP_POLL_INTERVAL = 0.5
+
+async def test_health_check(client: httpx.AsyncClient):
     """Test health check endpoint"""
     print("Testing health check...")
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=10)
+        # The server loads the RAG system in the background and answers 503
+        # "warming" until it is done; poll the pooled connection through the
+        # cold start rather than failing on the first request
+        deadline = time.monotonic() + WARMUP_TIMEOUT
+        response = await client.get("/health", timeout=10)
+        while response.status_code == 503 and time.monotonic() < deadline:
+            if orjson.loads(response.content).get('status') != 'warming':
+                break
+            await asyncio.sleep(WARMUP_POLL_INTERVAL)
+            response = await client.get("/health", timeout=10)
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
-            print(f"Response: {json.dumps(data, indent=2)}")
+            data = orjson.loads(response.content)
+            print(f"Response: {orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}")
             
             # Check system status
             if data.get('status') == 'healthy':
@@ -49,7 +64,7 @@ def test_health_check():
             print(f"✗ Health check failed with status {response.status_code}")
             return False
             
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("✗ Connection failed. Make sure the API server is running.")
         print("  Start the server with: python api_backend.py")
         return False
@@ -57,64 +72,64 @@ def test_health_check():
         print(f"✗ Error: {e}")
         return False
 
-def test_stats():
+async def test_stats(client: httpx.AsyncClient, out=print):
     """Test stats endpoint"""
-    print("\nTesting stats endpoint...")
+    out("\nTesting stats endpoint...")
     try:
-        response = requests.get(f"{BASE_URL}/api/v1/stats", headers=HEADERS, timeout=10)
-        print(f"Status: {response.status_code}")
+        response = await client.get("/api/v1/stats", timeout=10)
+        out(f"Status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
-            print(f"Response: {json.dumps(data, indent=2)}")
+            data = orjson.loads(response.content)
+            out(f"Response: {orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}")
             
             if data.get('total_chunks', 0) > 0:
-                print("✓ Vector database has data")
+                out("✓ Vector database has data")
             else:
-                print("⚠️ Vector database is empty")
+                out("⚠️ Vector database is empty")
             
             return True
         else:
-            print(f"✗ Stats failed with status {response.status_code}")
+            out(f"✗ Stats failed with status {response.status_code}")
             return False
             
     except Exception as e:
-        print(f"✗ Error: {e}")
+        out(f"✗ Error: {e}")
         return False
 
-def test_query():
+async def test_query(client: httpx.AsyncClient, out=print):
     """Test direct query endpoint"""
-    print("\nTesting direct query...")
+    out("\nTesting direct query...")
     try:
         params = {
             "question": "What is the grace period for premium payment?",
             "top_k": 3
         }
-        response = requests.post(f"{BASE_URL}/api/v1/query", headers=HEADERS, params=params, timeout=30)
-        print(f"Status: {response.status_code}")
+        response = await client.post("/api/v1/query", params=params, timeout=30)
+        out(f"Status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
-            print(f"Response: {json.dumps(data, indent=2)}")
+            data = orjson.loads(response.content)
+            out(f"Response: {orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}")
             
             if data.get('total_results', 0) > 0:
-                print("✓ Query returned results")
+                out("✓ Query returned results")
             else:
-                print("⚠️ Query returned no results")
+                out("⚠️ Query returned no results")
             
             return True
         else:
-            print(f"✗ Query failed with status {response.status_code}")
-            print(f"Error: {response.text}")
+            out(f"✗ Query failed with status {response.status_code}")
+            out(f"Error: {response.text}")
             return False
             
     except Exception as e:
-        print(f"✗ Error: {e}")
+        out(f"✗ Error: {e}")
         return False
 
-def test_run_submission():
+async def test_run_submission(client: httpx.AsyncClient, out=print):
     """Test the main run submission endpoint"""
-    print("\nTesting run submission...")
+    out("\nTesting run submission...")
     
     # Sample request based on the documentation
     payload = {
@@ -128,35 +143,37 @@ def test_run_submission():
     
     try:
         start_time = time.time()
-        response = requests.post(f"{BASE_URL}/api/v1/hackrx/run", headers=HEADERS, json=payload, timeout=60)
+        response = await client.post("/api/v1/hackrx/run", content=orjson.dumps(payload), timeout=60)
         end_time = time.time()
         
-        print(f"Status: {response.status_code}")
-        print(f"Response time: {end_time - start_time:.2f} seconds")
+        out(f"Status: {response.status_code}")
+        out(f"Response time: {end_time - start_time:.2f} seconds")
         
         if response.status_code == 200:
-            result = response.json()
-            print("✓ Run submission successful")
-            print("Answers:")
+            result = orjson.loads(response.content)
+            out("✓ Run submission successful")
+            out("Answers:")
             for i, answer in enumerate(result['answers'], 1):
-                print(f"{i}. {answer}")
-                print("-" * 50)
+                out(f"{i}. {answer}")
+                out("-" * 50)
             return True
         else:
-            print(f"✗ Run submission failed with status {response.status_code}")
-            print(f"Error: {response.text}")
+            out(f"✗ Run submission failed with status {response.status_code}")
+            out(f"Error: {response.text}")
             return False
             
     except Exception as e:
-        print(f"✗ Error: {e}")
+        out(f"✗ Error: {e}")
         return False
 
 def check_environment():
     """Check environment configuration"""
     print("=== Environment Check ===")
     
+    entries = set(os.listdir('.'))
+    
     # Check .env file
-    if os.path.exists(".env"):
+    if ".env" in entries:
         print("✓ .env file exists")
     else:
         print("✗ .env file not found")
@@ -164,7 +181,7 @@ def check_environment():
         return False
     
     # Check Groq API key
-    groq_key = os.getenv("GROQ_API_KEY")
+    groq_key = _ENV.get("GROQ_API_KEY")
     if groq_key and groq_key != "your-groq-api-key-here":
         print("✓ GROQ_API_KEY configured")
     else:
@@ -172,7 +189,7 @@ def check_environment():
         print("  Please set your Groq API key in .env file")
     
     # Check vector database
-    if os.path.exists("vector_db"):
+    if "vector_db" in entries:
         print("✓ Vector database exists")
     else:
         print("✗ Vector database not found")
@@ -180,7 +197,7 @@ def check_environment():
     
     return True
 
-def main():
+async def main():
     """Run all tests"""
     print("Insurance Policy RAG API - Test Client")
     print("=" * 50)
@@ -190,22 +207,29 @@ def main():
         print("\nEnvironment check failed. Please fix the issues above.")
         return
     
-    # Test health check
-    health_ok = test_health_check()
-    
-    if not health_ok:
-        print("\nHealth check failed. Make sure the API server is running.")
-        print("Start the server with: python api_backend.py")
-        return
-    
-    # Test stats
-    stats_ok = test_stats()
-    
-    # Test direct query
-    query_ok = test_query()
+    # One pooled client for every test; HTTP/2 needs TLS, so it is only
+    # negotiated for an https BASE_URL
+    async with httpx.AsyncClient(base_url=BASE_URL, headers=HEADERS, timeout=60,
+                                 http2=BASE_URL.startswith("https")) as client:
+        # Test health check
+        health_ok = await test_health_check(client)
+        
+        if not health_ok:
+            print("\nHealth check failed. Make sure the API server is running.")
+            print("Start the server with: python api_backend.py")
+            return
+        
+        # Run stats, direct query and run submission concurrently, buffering
+        # their output so each test prints as one block once all finish
+        tests = (test_stats, test_query, test_run_submission)
+        outputs = [[] for _ in tests]
+        stats_ok, query_ok, run_ok = await asyncio.gather(
+            *(test(client, output.append) for test, output in zip(tests, outputs))
+        )
     
-    # Test run submission
-    run_ok = test_run_submission()
+    for output in outputs:
+        for line in output:
+            print(line)
     
     # Summary
     print("\n" + "=" * 50)
@@ -221,4 +245,4 @@ def main():
         print("\n⚠️ Some tests failed. Check the API server and configuration.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    asyncio.run(main()) 
\ No newline at end of file
